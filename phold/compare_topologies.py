@@ -1,22 +1,50 @@
 #!/usr/bin/env python3
 """
-Compare topologies from SST JSON output files using NetworkX.
+Compare topologies from SST JSON output files.
+NetworkX and matplotlib are only imported to draw the comparison plot.
 Supports both naming conventions:
   - Original: link_x_y_to_x_y
   - AHP: SubGridN.comp_x_y.portN__delay__SubGridM.comp_a_b.portM
 """
 
+import functools
 import json
+import os
 import re
 import sys
-import networkx as nx
-import matplotlib.pyplot as plt
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import NamedTuple
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+_OG_PATTERN = r'link_(\d+)_(\d+)_to_(\d+)_(\d+)'
+# Pattern: SubGridN.comp_X_Y.portP__delay__SubGridM.comp_A_B.portQ
+_AHP_PATTERN = r'SubGrid\d+\.comp_(\d+)_(\d+)\.port\d+__\d+\s*\w*__SubGrid\d+\.comp_(\d+)_(\d+)\.port\d+'
+_OG_RE = re.compile(_OG_PATTERN)
+_AHP_RE = re.compile(_AHP_PATTERN)
+# Either naming convention in one pass: groups 1-4 are original, groups 5-8 are AHP.
+_LINK_RE = re.compile(f'{_OG_PATTERN}|{_AHP_PATTERN}')
+_COMP_RE = re.compile(r'comp_(\d+)_(\d+)')
+
+
+@functools.lru_cache(maxsize=1 << 16)
+def _parse_comp(name: str) -> tuple[int, int] | None:
+    """Parse component names like 'comp_0_1' or 'SubGrid0.comp_0_1' -> (0, 1)"""
+    match = _COMP_RE.search(name)
+    if match:
+        return int(match.group(1)), int(match.group(2))
+    return None
 
 
 def parse_original_link_name(link_name: str) -> tuple[tuple[int, int], tuple[int, int]] | None:
     """Parse link names like 'link_0_0_to_0_1' -> ((0,0), (0,1))"""
-    match = re.match(r'link_(\d+)_(\d+)_to_(\d+)_(\d+)', link_name)
+    match = _OG_RE.match(link_name)
     if match:
         src = (int(match.group(1)), int(match.group(2)))
         dst = (int(match.group(3)), int(match.group(4)))
@@ -26,11 +54,7 @@ def parse_original_link_name(link_name: str) -> tuple[tuple[int, int], tuple[int
 
 def parse_ahp_link_name(link_name: str) -> tuple[tuple[int, int], tuple[int, int]] | None:
     """Parse link names like 'SubGrid0.comp_0_0.port12__1ns__SubGrid0.comp_0_1.port11'"""
-    # Pattern: SubGridN.comp_X_Y.portP__delay__SubGridM.comp_A_B.portQ
-    match = re.match(
-        r'SubGrid\d+\.comp_(\d+)_(\d+)\.port\d+__\d+\s*\w*__SubGrid\d+\.comp_(\d+)_(\d+)\.port\d+',
-        link_name
-    )
+    match = _AHP_RE.match(link_name)
     if match:
         src = (int(match.group(1)), int(match.group(2)))
         dst = (int(match.group(3)), int(match.group(4)))
@@ -38,122 +62,159 @@ def parse_ahp_link_name(link_name: str) -> tuple[tuple[int, int], tuple[int, int
     return None
 
 
-def load_topology_from_json(json_path: str) -> nx.Graph:
+def _load_json(json_path: str) -> dict:
+    """Parse a JSON file, using orjson when it is installed."""
+    if orjson is None:
+        with open(json_path, 'r') as f:
+            return json.load(f)
+    with open(json_path, 'rb') as f:
+        return orjson.loads(f.read())
+
+
+class Topology(NamedTuple):
+    """Grid topology: (i, j) nodes, undirected edges keyed by edge_key, and per-node degree."""
+    nodes: set[tuple[int, int]]
+    edges: set[tuple]
+    degree: Counter
+
+
+def edge_key(u, v) -> tuple:
+    """Orientation-independent key for an undirected edge."""
+    return (u, v) if u <= v else (v, u)
+
+
+def make_topology(nodes: set, edges: set) -> Topology:
+    """Build a Topology, adding edge endpoints to the node set and counting degrees."""
+    degree = Counter()
+    for u, v in edges:
+        degree[u] += 1
+        degree[v] += 1
+    return Topology(nodes | degree.keys(), edges, degree)
+
+
+def load_topology_from_json(json_path: str) -> Topology:
     """Load a topology from an SST JSON file."""
-    with open(json_path, 'r') as f:
-        data = json.load(f)
+    data = _load_json(json_path)
     
-    G = nx.Graph()
+    nodes = set()
+    edges = set()
     
     # Add nodes from components
     for comp in data.get('components', []):
-        name = comp['name']
         # Extract coordinates from component name
         # Original: comp_x_y or AHP: SubGridN.comp_x_y
-        match = re.search(r'comp_(\d+)_(\d+)', name)
-        if match:
-            node = (int(match.group(1)), int(match.group(2)))
-            G.add_node(node, name=name)
+        node = _parse_comp(comp['name'])
+        if node is not None:
+            nodes.add(node)
     
     # Add edges from links
     for link in data.get('links', []):
-        link_name = link.get('name', '')
-        
-        # Try original format first
-        edge = parse_original_link_name(link_name)
-        if edge is None:
-            # Try AHP format
-            edge = parse_ahp_link_name(link_name)
-        
-        if edge:
-            src, dst = edge
+        match = _LINK_RE.match(link.get('name', ''))
+        if match:
+            # Original format fills groups 1-4, AHP format fills groups 5-8
+            offset = 0 if match.group(1) is not None else 4
+            src = (int(match.group(offset + 1)), int(match.group(offset + 2)))
+            dst = (int(match.group(offset + 3)), int(match.group(offset + 4)))
             # Skip self-loops for cleaner visualization (optional)
             if src != dst:
-                G.add_edge(src, dst, name=link_name)
+                edges.add(edge_key(src, dst))
     
-    return G
+    return make_topology(nodes, edges)
 
 
-def load_topology_from_multiple_json(json_paths: list[str]) -> nx.Graph:
+def load_topology_from_multiple_json(json_paths: list[str]) -> Topology:
     """Load and merge topologies from multiple JSON files (one per rank)."""
-    G = nx.Graph()
-    
-    for json_path in json_paths:
-        partial_G = load_topology_from_json(json_path)
-        G = nx.compose(G, partial_G)
+    with ThreadPoolExecutor(max_workers=min(len(json_paths), os.cpu_count() or 1)) as executor:
+        partials = list(executor.map(load_topology_from_json, json_paths))
     
-    return G
+    # Links that cross ranks appear in both files, so degrees are recounted from the merged edges
+    return make_topology(set().union(*(t.nodes for t in partials)),
+                         set().union(*(t.edges for t in partials)))
 
 
-def compare_graphs(G1: nx.Graph, G2: nx.Graph, name1: str = "Graph1", name2: str = "Graph2"):
-    """Compare two graphs and print differences."""
-    print(f"\n{'='*60}")
-    print(f"Comparison: {name1} vs {name2}")
-    print(f"{'='*60}")
+def compare_graphs(G1: Topology, G2: Topology, name1: str = "Graph1", name2: str = "Graph2"):
+    """Compare two topologies and print differences."""
+    # Collected and written once at the end, since the edge diffs can run to thousands of lines
+    out = []
+    out.append(f"\n{'='*60}")
+    out.append(f"Comparison: {name1} vs {name2}")
+    out.append(f"{'='*60}")
     
     # Node comparison
-    nodes1 = set(G1.nodes())
-    nodes2 = set(G2.nodes())
+    nodes1 = G1.nodes
+    nodes2 = G2.nodes
     
-    print(f"\n{name1} nodes: {len(nodes1)}")
-    print(f"{name2} nodes: {len(nodes2)}")
+    out.append(f"\n{name1} nodes: {len(nodes1)}")
+    out.append(f"{name2} nodes: {len(nodes2)}")
     
     only_in_1 = nodes1 - nodes2
     only_in_2 = nodes2 - nodes1
     common_nodes = nodes1 & nodes2
     
     if only_in_1:
-        print(f"\nNodes only in {name1}: {sorted(only_in_1)}")
+        out.append(f"\nNodes only in {name1}: {sorted(only_in_1)}")
     if only_in_2:
-        print(f"Nodes only in {name2}: {sorted(only_in_2)}")
-    print(f"Common nodes: {len(common_nodes)}")
+        out.append(f"Nodes only in {name2}: {sorted(only_in_2)}")
+    out.append(f"Common nodes: {len(common_nodes)}")
     
     # Edge comparison
-    edges1 = set(frozenset(e) for e in G1.edges())
-    edges2 = set(frozenset(e) for e in G2.edges())
+    edges1 = G1.edges
+    edges2 = G2.edges
     
-    print(f"\n{name1} edges: {len(edges1)}")
-    print(f"{name2} edges: {len(edges2)}")
+    out.append(f"\n{name1} edges: {len(edges1)}")
+    out.append(f"{name2} edges: {len(edges2)}")
     
     only_in_1_edges = edges1 - edges2
     only_in_2_edges = edges2 - edges1
     common_edges = edges1 & edges2
     
     if only_in_1_edges:
-        print(f"\nEdges only in {name1} ({len(only_in_1_edges)}):")
-        for e in sorted(only_in_1_edges, key=lambda x: tuple(sorted(x))):
-            print(f"  {tuple(sorted(e))}")
+        out.append(f"\nEdges only in {name1} ({len(only_in_1_edges)}):")
+        out.extend(f"  {e}" for e in sorted(only_in_1_edges))
     if only_in_2_edges:
-        print(f"\nEdges only in {name2} ({len(only_in_2_edges)}):")
-        for e in sorted(only_in_2_edges, key=lambda x: tuple(sorted(x))):
-            print(f"  {tuple(sorted(e))}")
+        out.append(f"\nEdges only in {name2} ({len(only_in_2_edges)}):")
+        out.extend(f"  {e}" for e in sorted(only_in_2_edges))
     
-    print(f"\nCommon edges: {len(common_edges)}")
+    out.append(f"\nCommon edges: {len(common_edges)}")
     
     # Degree comparison for common nodes
-    print(f"\n{'='*60}")
-    print("Degree comparison for common nodes:")
-    print(f"{'='*60}")
+    out.append(f"\n{'='*60}")
+    out.append("Degree comparison for common nodes:")
+    out.append(f"{'='*60}")
+    nodes_equal = nodes1 == nodes2
+    edges_equal = edges1 == edges2
     degree_diff = []
-    for node in sorted(common_nodes):
-        d1 = G1.degree(node)
-        d2 = G2.degree(node)
-        if d1 != d2:
-            degree_diff.append((node, d1, d2))
+    # Identical node and edge sets imply identical degrees, so only look when something differs
+    if not (nodes_equal and edges_equal):
+        degree1 = G1.degree
+        degree2 = G2.degree
+        for node in sorted(common_nodes):
+            d1 = degree1[node]
+            d2 = degree2[node]
+            if d1 != d2:
+                degree_diff.append((node, d1, d2))
     
     if degree_diff:
-        print(f"{'Node':<12} {name1:<10} {name2:<10}")
-        print("-" * 32)
+        out.append(f"{'Node':<12} {name1:<10} {name2:<10}")
+        out.append("-" * 32)
         for node, d1, d2 in degree_diff:
-            print(f"{str(node):<12} {d1:<10} {d2:<10}")
+            out.append(f"{str(node):<12} {d1:<10} {d2:<10}")
     else:
-        print("All common nodes have the same degree in both graphs.")
+        out.append("All common nodes have the same degree in both graphs.")
     
-    return nodes1 == nodes2 and edges1 == edges2
+    sys.stdout.write("\n".join(out) + "\n")
+    return nodes_equal and edges_equal
 
 
-def visualize_topology(G: nx.Graph, title: str, ax=None, highlight_edges=None):
+def visualize_topology(topology: Topology, title: str, ax=None, highlight_edges=None):
     """Visualize a topology graph."""
+    import matplotlib.pyplot as plt
+    import networkx as nx
+    
+    G = nx.Graph()
+    G.add_nodes_from(topology.nodes)
+    G.add_edges_from(topology.edges)
+    
     if ax is None:
         fig, ax = plt.subplots(1, 1, figsize=(12, 10))
     
@@ -167,8 +228,8 @@ def visualize_topology(G: nx.Graph, title: str, ax=None, highlight_edges=None):
     # Draw edges
     if highlight_edges:
         # Draw normal edges
-        normal_edges = [e for e in G.edges() if frozenset(e) not in highlight_edges]
-        highlight_edge_list = [e for e in G.edges() if frozenset(e) in highlight_edges]
+        normal_edges = [e for e in G.edges() if edge_key(*e) not in highlight_edges]
+        highlight_edge_list = [e for e in G.edges() if edge_key(*e) in highlight_edges]
         
         nx.draw_networkx_edges(G, pos, ax=ax, edgelist=normal_edges,
                               edge_color='gray', alpha=0.5)
@@ -189,7 +250,7 @@ def main():
     import argparse
     
     parser = argparse.ArgumentParser(
-        description='Compare SST topologies from JSON files using NetworkX'
+        description='Compare SST topologies from JSON files'
     )
     parser.add_argument('--og', nargs='+', required=True,
                        help='Original topology JSON files (e.g., og0.json og1.json ...)')
@@ -219,13 +280,13 @@ def main():
     
     # Visualize
     if not args.no_plot:
+        import matplotlib.pyplot as plt
+        
         fig, axes = plt.subplots(1, 2, figsize=(20, 10))
         
         # Find edges unique to each graph for highlighting
-        edges_og = set(frozenset(e) for e in G_og.edges())
-        edges_ahp = set(frozenset(e) for e in G_ahp.edges())
-        only_og = edges_og - edges_ahp
-        only_ahp = edges_ahp - edges_og
+        only_og = G_og.edges - G_ahp.edges
+        only_ahp = G_ahp.edges - G_og.edges
         
         visualize_topology(G_og, "Original Topology", axes[0], highlight_edges=only_og)
         visualize_topology(G_ahp, "AHP Topology", axes[1], highlight_edges=only_ahp)
@@ -1,10 +1,9 @@
 
-import pandas as pd
-import numpy as np
 import sys
 import os
+import csv
 
-from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures import ProcessPoolExecutor
 
 
 from extractors import extract_row, identify_result_dirs
@@ -23,47 +22,49 @@ if __name__ == "__main__":
 
   (result_dirs,invalid_dirs) = identify_result_dirs(experiment_name)
   
-  with ProcessPoolExecutor(max_workers=8) as executor:
-    data = list(executor.map(extract_row, result_dirs))
-
-  failure_indices = [i for i, d in enumerate(data) if d is None]
-  additional_failures = [result_dirs[i] for i in failure_indices]
-  invalid_dirs += [(failure, 'Collection failure') for failure in additional_failures]
-
-  data = [d for d in data if d is not None]
-  if len(data) == 0:
-    print("No valid data found. Exiting.")
-    sys.exit(0)
-  with open(outfile, 'w') as f:
-      entry = data[0]
-      f.write(','.join(entry.keys()) + "\n")
-      for entry in data:
-          f.write(','.join(map(str, entry.values())) + "\n")
-
-
-  print(f"Results consolidated into {outfile}.")
-
-
-  failure_outfile = outfile.replace('.csv', '-failures.csv')
-  print(f"Now consolidating failures into {failure_outfile}...")
-
-  failure_data = []
-  for dir_name, reason in invalid_dirs:
-    srun_output_file = dir_name.replace('_dir', '.err')
-    srun_output_path = os.path.join(dir_name, srun_output_file)
-    reason = extractors.extract_failure_reason(srun_output_path)
-
-    parameters = extractors.extract_parameters(dir_name)
-    parameters['Status'] = reason
-    failure_data.append(parameters)
-
-  if len(failure_data) == 0:
-    print("No failures found. Exiting.")
-    sys.exit(0)
-  with open(failure_outfile, 'w') as f:
-    entry = failure_data[0]
-    f.write(','.join(entry.keys()) + "\n")
-    for entry in failure_data:
-      f.write(','.join(map(str, entry.values())) + "\n")
+  max_workers = 8
+  # One pool serves both phases, so the worker processes (and their numpy import via extractors) are only paid for once.
+  with ProcessPoolExecutor(max_workers=max_workers) as executor:
+    # Hand each worker batches of directories so pickling/IPC is amortized over many rows.
+    chunksize = max(1, len(result_dirs) // (max_workers * 4))
+    data = list(executor.map(extract_row, result_dirs, chunksize=chunksize))
+
+    failure_indices = [i for i, d in enumerate(data) if d is None]
+    additional_failures = [result_dirs[i] for i in failure_indices]
+    invalid_dirs += [(failure, 'Collection failure') for failure in additional_failures]
+
+    data = [d for d in data if d is not None]
+    if len(data) == 0:
+      print("No valid data found. Exiting.")
+      sys.exit(0)
+    with open(outfile, 'w', buffering=1 << 20, newline='') as f:
+      # Rows can lack columns (e.g. no sync data), so the header is the ordered union of keys
+      fieldnames = list(dict.fromkeys(k for d in data for k in d))
+      writer = csv.DictWriter(f, fieldnames=fieldnames)
+      writer.writeheader()
+      writer.writerows(data)
+
+
+    print(f"Results consolidated into {outfile}.")
+
+
+    failure_outfile = outfile.replace('.csv', '-failures.csv')
+    print(f"Now consolidating failures into {failure_outfile}...")
+
+    if len(invalid_dirs) == 0:
+      print("No failures found. Exiting.")
+      sys.exit(0)
+    srun_output_paths = [os.path.join(dir_name, dir_name.replace('_dir', '.err')) for dir_name, _ in invalid_dirs]
+    # The .err reads are I/O bound and overlap across the already-running workers.
+    # Rows are written as they are extracted, under a fixed header.
+    chunksize = max(1, len(srun_output_paths) // (max_workers * 4))
+    reasons = executor.map(extractors.extract_failure_reason, srun_output_paths, chunksize=chunksize)
+    with open(failure_outfile, 'w', buffering=1 << 20, newline='') as f:
+      writer = csv.DictWriter(f, fieldnames=extractors.PARAMETER_FIELDS + ['Status'])
+      writer.writeheader()
+      for (dir_name, _), reason in zip(invalid_dirs, reasons):
+        parameters = extractors.extract_parameters(dir_name)
+        parameters['Status'] = reason
+        writer.writerow(parameters)
 
   print(f"Failures consolidated into {failure_outfile}.")
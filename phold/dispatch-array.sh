@@ -0,0 +1,14 @@
+#!/bin/bash
+# Entry point for the array jobs queued by `submit.py --array`.
+# Each task runs dispatch.sh with the arguments on line $SLURM_ARRAY_TASK_ID of the manifest.
+set -x
+scriptDir="${PHOLD_SCRIPT_DIR:-$(dirname "$(scontrol show job "$SLURM_JOB_ID" | awk -F= '/Command=/{print $2}')")}"
+manifest=$1
+
+read -r -a dispatchArgs <<< "$(sed -n "$((SLURM_ARRAY_TASK_ID + 1))p" "$manifest")"
+prefix=${dispatchArgs[14]}
+
+# Expose the task's SLURM output under the same <prefix>.out name as a single job submission.
+ln -sf "${SLURM_JOB_NAME}_${SLURM_ARRAY_JOB_ID}_${SLURM_ARRAY_TASK_ID}.out" "${prefix}.out"
+
+"$scriptDir/dispatch.sh" "${dispatchArgs[@]}"
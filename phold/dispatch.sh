@@ -1,6 +1,6 @@
 #!/bin/bash
 set -x
-scriptDir="$(dirname "$(scontrol show job "$SLURM_JOB_ID" | awk -F= '/Command=/{print $2}')")"
+scriptDir="${PHOLD_SCRIPT_DIR:-$(dirname "$(scontrol show job "$SLURM_JOB_ID" | awk -F= '/Command=/{print $2}')")}"
 echo "$scriptDir"
 
 nodeCount=$1
@@ -1,11 +1,10 @@
 
-import pandas as pd
 import numpy as np
 import sys
 import os
 import humanfriendly
 
-from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
 
 def identify_result_dirs(experiment_name=None):
   """
@@ -174,6 +173,16 @@ def extract_time_data(results_dir):
 
   return None
 
+
+# Keys of the dict returned by extract_parameters, in column order
+PARAMETER_FIELDS = [
+  'Experiment Name', 'Node Count', 'Ranks Per Node', 'Thread Count', 'Width',
+  'Height', 'Event Density', 'Ring Size', 'Time to Run (ns)',
+  'Small Payload (bytes)', 'Large Payload (bytes)', 'Large Event Fraction',
+  'Imbalance Factor', 'Component Size', 'Component Computation',
+]
+
+
 def extract_parameters(results_dir):
   """
   Extract parameters from the directory name.
@@ -1,6 +1,9 @@
 import sys
+import csv
 import extractors
 
+from concurrent.futures import ThreadPoolExecutor
+
 
 if len(sys.argv) != 3:
     print("Usage: python identify_failures.py <output file> <experiment_name>")
@@ -12,11 +15,13 @@ experiment_name = sys.argv[2]
 (successes_dirs, invalid_dirs) = extractors.identify_result_dirs(experiment_name)
 
 
-data = []
-for dir_name, reason in invalid_dirs:
-  sbatch_output = dir_name.replace('_dir', '.out')
-  reason = extractors.extract_failure_reason(sbatch_output)
+sbatch_outputs = [dir_name.replace('_dir', '.out') for dir_name, _ in invalid_dirs]
+# Reading the sbatch output files is I/O bound, so overlap the reads with threads.
+with ThreadPoolExecutor(max_workers=32) as executor:
+  reasons = list(executor.map(extractors.extract_failure_reason, sbatch_outputs))
 
+data = []
+for (dir_name, _), reason in zip(invalid_dirs, reasons):
   parameters = extractors.extract_parameters(dir_name)
   parameters['Status'] = reason
   data.append(parameters)
@@ -24,11 +29,12 @@ for dir_name, reason in invalid_dirs:
 if len(data) == 0:
     print("No failures found. Exiting.")
     sys.exit(0)
-with open(output_file, 'w') as f:
-  entry = data[0]
-  f.write(','.join(entry.keys()) + "\n")
-  for entry in data:
-    f.write(','.join(map(str, entry.values())) + "\n")
+with open(output_file, 'w', buffering=1 << 20, newline='') as f:
+  # Header is the ordered union of keys, so a row missing a column is written blank
+  fieldnames = list(dict.fromkeys(k for d in data for k in d))
+  writer = csv.DictWriter(f, fieldnames=fieldnames)
+  writer.writeheader()
+  writer.writerows(data)
 
 
 print(f"Failures consolidated into {output_file}.")
\ No newline at end of file
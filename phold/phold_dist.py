@@ -1,8 +1,12 @@
 """PHOLD benchmark"""
 
 import argparse
+import bisect
 import sst
 
+# Rows and columns per block when wiring links
+TILE = 64
+
 
 def log_init(my_rank: int, num_ranks: int, num_threads: int) -> None:
     """Log initial simulation context."""
@@ -132,6 +136,9 @@ def imbalance_thread_map(M: int, imbalance_factor: float, thread_count: int):
 
     We allocate relative weights using an imbalance factor. A factor of 0
     distributes evenly; 1.0 assigns all work to thread 0.
+
+    phold_dist_ahp.py has its own copy (SST loads each script standalone);
+    keep the two in sync. test_imbalance_thread_map.py checks they agree.
     """
     first_weight = (1 + (thread_count - 1) * imbalance_factor) / thread_count
     other_weight = first_weight - imbalance_factor
@@ -141,20 +148,36 @@ def imbalance_thread_map(M: int, imbalance_factor: float, thread_count: int):
     for w in weights:
         buckets.append(buckets[-1] + w * M)
 
-    def thread_for_index(idx: int) -> int:
-        for t in range(thread_count):
-            if buckets[t] <= idx < buckets[t + 1]:
-                return t
-        return thread_count - 1
+    # Precompute the thread for every column so lookups are a list index.
+    # Columns past the last bucket (float rounding) go to the last thread.
+    table = [
+        min(bisect.bisect_right(buckets, idx) - 1, thread_count - 1)
+        for idx in range(M)
+    ]
+    return table.__getitem__
+
 
-    return thread_for_index
+def rank_rows(rank: int, N: int, num_ranks: int) -> tuple:
+    """Return the [row_start, row_end) rows owned by `rank`.
+
+    Rows are divided evenly among ranks; the first N % num_ranks ranks get
+    one extra row. This matches subgrid_rows in phold_dist_ahp.py.
+    """
+    rows_per, extra = divmod(N, num_ranks)
+    row_start = rank * rows_per + min(rank, extra)
+    return row_start, row_start + rows_per + (1 if rank < extra else 0)
 
 
-def row_to_rank(i: int, N: int, rows_per_rank: int, num_ranks: int) -> int:
-    """Map a global row index to MPI rank."""
+def row_to_rank(i: int, N: int, num_ranks: int) -> int:
+    """Map a global row index to MPI rank (the inverse of rank_rows)."""
     if i < 0 or i >= N:
         raise ValueError(f"Row index {i} out of bounds for N={N}")
-    return min(i // rows_per_rank, num_ranks - 1)
+    rows_per, extra = divmod(N, num_ranks)
+    # The first `extra` ranks hold rows_per + 1 rows each
+    boundary = extra * (rows_per + 1)
+    if i < boundary:
+        return i // (rows_per + 1)
+    return extra + (i - boundary) // rows_per
 
 
 def col_to_thread(j: int, M: int, thread_map) -> int:
@@ -164,32 +187,36 @@ def col_to_thread(j: int, M: int, thread_map) -> int:
     return thread_map(j)
 
 
-def create_component(i: int, j: int, args, rows_per_rank: int, num_ranks: int,
-                    thread_map):
-    """Create and parameterize a PHOLD component, assign rank/thread."""
+def base_params(args) -> dict:
+    """Return the component parameters shared by every component."""
+    return {
+        "numRings": args.numRings,
+        "colCount": args.width,
+        "rowCount": args.height,
+        "timeToRun": args.timeToRun,
+        "multiplier": args.exponentMultiplier,
+        "eventDensity": args.eventDensity,
+        "smallPayload": args.smallPayload,
+        "largePayload": args.largePayload,
+        "largeEventFraction": args.largeEventFraction,
+        "verbose": args.verbose,
+        "componentSize": args.componentSize,
+        "componentComputation": args.componentComputation,
+    }
+
+
+def create_component(i: int, j: int, args, shared_params: dict, rank: int,
+                     thread: int):
+    """Create and parameterize a PHOLD component, assign rank/thread.
+
+    shared_params comes from base_params; only i and j are added per component.
+    """
     comp = sst.Component(f"comp_{i}_{j}", args.nodeType)
-    comp.addParams(
-        {
-            "numRings": args.numRings,
-            "i": i,
-            "j": j,
-            "colCount": args.width,
-            "rowCount": args.height,
-            "timeToRun": args.timeToRun,
-            "multiplier": args.exponentMultiplier,
-            "eventDensity": args.eventDensity,
-            "smallPayload": args.smallPayload,
-            "largePayload": args.largePayload,
-            "largeEventFraction": args.largeEventFraction,
-            "verbose": args.verbose,
-            "componentSize": args.componentSize,
-            "componentComputation": args.componentComputation,
-        }
-    )
-    comp.setRank(
-        row_to_rank(i, args.height, rows_per_rank, num_ranks),
-        col_to_thread(j, args.width, thread_map),
-    )
+    params = shared_params.copy()
+    params["i"] = i
+    params["j"] = j
+    comp.addParams(params)
+    comp.setRank(rank, thread)
     return comp
 
 
@@ -203,51 +230,86 @@ def port_num(i: int, j: int, i2: int, j2: int, num_rings: int) -> int:
     return ip * side + jp
 
 
-def connect_upwards(local_i: int, local_j: int, num_rings: int, comps,
-                    low_ghost_start: int, args, my_rank: int, num_ranks: int,
-                    rows_per_rank: int, link_counter: dict) -> None:
-    """Wire links from a local stencil position upwards (including self)."""
-    my_idx = ((num_rings * 2 + 1) ** 2 - 1) // 2  # self-connect center
-    high_idx = (num_rings * 2 + 1) ** 2 - 1       # max index in stencil
+def upward_offsets(num_rings: int, self_links: bool = True) -> list:
+    """Return the upward half-stencil (including self) as (di, dj, port1, port2).
 
+    port1 is the port on the local component, port2 the port on the neighbor.
+    """
+    side = num_rings * 2 + 1
+    my_idx = (side ** 2 - 1) // 2  # self-connect center
+    high_idx = side ** 2 - 1       # max index in stencil
+
+    offsets = []
     for nbr_idx in range(my_idx, high_idx + 1):
-        side = num_rings * 2 + 1
-        my_ring_i = my_idx // side
-        my_ring_j = my_idx % side
-        nbr_ring_i = nbr_idx // side
-        nbr_ring_j = nbr_idx % side
-        nbr_i = local_i + nbr_ring_i - my_ring_i
-        nbr_j = local_j + nbr_ring_j - my_ring_j
-
-        if args.no_self_links and nbr_i == local_i and nbr_j == local_j:
-            continue
-        
-        if nbr_i < 0 or nbr_i >= len(comps) or nbr_j < 0 or nbr_j >= args.width:
+        di = nbr_idx // side - num_rings
+        dj = nbr_idx % side - num_rings
+        if not self_links and di == 0 and dj == 0:
             continue
+        offsets.append((di, dj,
+                        port_num(0, 0, di, dj, num_rings),
+                        port_num(di, dj, 0, 0, num_rings)))
+    return offsets
 
-        port1 = port_num(local_i, local_j, nbr_i, nbr_j, num_rings)
-        port2 = port_num(nbr_i, nbr_j, local_i, local_j, num_rings)
 
-        global_i = low_ghost_start + local_i
-        global_j = local_j
-        nbr_global_i = low_ghost_start + nbr_i
-        nbr_global_j = nbr_j
+def specialize_connect_upwards(offsets: list):
+    """Return a connect_upwards function with the stencil unrolled.
 
+    numRings is fixed for the whole run, so each entry of offsets (from
+    upward_offsets) becomes a straight-line block with literal ports and only
+    the bounds checks its direction can fail. The returned function takes
+    (local_i, local_j, comps, low_ghost_start, args, my_rank, row_ranks,
+    link_counter) and wires links from that stencil position upwards.
+    """
+    lines = [
+        "def connect_upwards(local_i, local_j, comps, low_ghost_start, args,",
+        "                    my_rank, row_ranks, link_counter):",
+        "    num_rows = len(comps)",
+        "    width = args.width",
+        "    delay = args.linkDelay",
+        "    link_cls = sst.Link",
+        "    src = comps[local_i][local_j]",
+        "    global_i = low_ghost_start + local_i",
+        "    src_is_local = row_ranks[global_i] == my_rank",
+        "    count = 0",
+    ]
+    def shifted(name, d):
+        return name if d == 0 else f"{name} {'-' if d < 0 else '+'} {abs(d)}"
+
+    for di, dj, port1, port2 in offsets:
+        # Upward offsets never move to an earlier row, or left within the same row
+        bounds = []
+        if di > 0:
+            bounds.append(f"local_i + {di} < num_rows")
+        if dj < 0:
+            bounds.append(f"local_j >= {-dj}")
+        elif dj > 0:
+            bounds.append(f"local_j + {dj} < width")
+        indent = "    "
+        if bounds:
+            lines.append(f"{indent}if {' and '.join(bounds)}:")
+            indent += "    "
         # Require at least one endpoint on this rank
-        local_rank = row_to_rank(global_i, args.height, rows_per_rank, num_ranks)
-        nbr_rank = row_to_rank(nbr_global_i, args.height, rows_per_rank, num_ranks)
-        if local_rank != my_rank and nbr_rank != my_rank:
-            continue
+        if di == 0:
+            lines.append(f"{indent}if src_is_local:")
+        else:
+            lines.append(
+                f"{indent}if src_is_local or row_ranks[{shifted('global_i', di)}] == my_rank:"
+            )
+        indent += "    "
+        lines += [
+            f"{indent}link_cls(f'link_{{global_i}}_{{local_j}}_to_"
+            f"{{{shifted('global_i', di)}}}_{{{shifted('local_j', dj)}}}').connect(",
+            f"{indent}    (src, 'port{port1}', delay),",
+            f"{indent}    (comps[{shifted('local_i', di)}][{shifted('local_j', dj)}], "
+            f"'port{port2}', delay),",
+            f"{indent})",
+            f"{indent}count += {1 if port1 == port2 else 2}",
+        ]
+    lines.append("    link_counter['count'] += count")
 
-        link_name = (
-            f"link_{global_i}_{global_j}_to_{nbr_global_i}_{nbr_global_j}"
-        )
-        link = sst.Link(link_name)
-        link.connect(
-            (comps[local_i][local_j], f"port{port1}", args.linkDelay),
-            (comps[nbr_i][nbr_j], f"port{port2}", args.linkDelay),
-        )
-        link_counter["count"] += 1 if port1 == port2 else 2
+    namespace = {"sst": sst}
+    exec("\n".join(lines), namespace)
+    return namespace["connect_upwards"]
 
 
 def main() -> None:
@@ -259,28 +321,34 @@ def main() -> None:
     parser = build_parser()
     args = parser.parse_args()
 
-    rows_per_rank = max(1, args.height // num_ranks)
     thread_map = imbalance_thread_map(
         args.width, args.imbalance_factor, num_threads
     )
 
     # Build local + ghost rows
-    my_row_start = my_rank * rows_per_rank
-    my_row_end = my_row_start + rows_per_rank
-    if my_rank == num_ranks - 1:
-        my_row_end = args.height
+    my_row_start, my_row_end = rank_rows(my_rank, args.height, num_ranks)
 
     low_ghost_start = max(0, my_row_start - args.numRings)
     low_ghost_end = my_row_start
     high_ghost_start = my_row_end
     high_ghost_end = min(args.height, my_row_end + args.numRings)
 
+    # Rank of every row and thread of every column, computed once rather than per component
+    row_ranks = [
+        row_to_rank(i, args.height, num_ranks)
+        for i in range(args.height)
+    ]
+    col_threads = [
+        col_to_thread(j, args.width, thread_map) for j in range(args.width)
+    ]
+
+    shared_params = base_params(args)
     comps = []
 
     # Low ghost rows
     for i in range(low_ghost_start, low_ghost_end):
         row = [
-            create_component(i, j, args, rows_per_rank, num_ranks, thread_map)
+            create_component(i, j, args, shared_params, row_ranks[i], col_threads[j])
             for j in range(args.width)
         ]
         comps.append(row)
@@ -288,7 +356,7 @@ def main() -> None:
     # Local owned rows
     for i in range(my_row_start, my_row_end):
         row = [
-            create_component(i, j, args, rows_per_rank, num_ranks, thread_map)
+            create_component(i, j, args, shared_params, row_ranks[i], col_threads[j])
             for j in range(args.width)
         ]
         comps.append(row)
@@ -296,26 +364,34 @@ def main() -> None:
     # High ghost rows
     for i in range(high_ghost_start, high_ghost_end):
         row = [
-            create_component(i, j, args, rows_per_rank, num_ranks, thread_map)
+            create_component(i, j, args, shared_params, row_ranks[i], col_threads[j])
             for j in range(args.width)
         ]
         comps.append(row)
 
+    connect_upwards = specialize_connect_upwards(
+        upward_offsets(args.numRings, not args.no_self_links)
+    )
     link_counter = {"count": 0}
-    for local_i in range(len(comps)):
-        for local_j in range(args.width):
-            connect_upwards(
-                local_i,
-                local_j,
-                args.numRings,
-                comps,
-                low_ghost_start,
-                args,
-                my_rank,
-                num_ranks,
-                rows_per_rank,
-                link_counter,
-            )
+    # Links from the high ghost rows only go to the same or later rows, which
+    # belong to later ranks, so they never have an endpoint here; skip them.
+    # Wide grids are wired in column tiles so the stencil rows being touched
+    # stay small.
+    num_link_rows = my_row_end - low_ghost_start
+    for tile_i in range(0, num_link_rows, TILE):
+        for tile_j in range(0, args.width, TILE):
+            for local_i in range(tile_i, min(tile_i + TILE, num_link_rows)):
+                for local_j in range(tile_j, min(tile_j + TILE, args.width)):
+                    connect_upwards(
+                        local_i,
+                        local_j,
+                        comps,
+                        low_ghost_start,
+                        args,
+                        my_rank,
+                        row_ranks,
+                        link_counter,
+                    )
 
 
 if __name__ == "__main__":
@@ -1,8 +1,11 @@
 import sys
 import os
+import bisect
 import argparse
 import time
 import resource
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 
 
 def get_memory_gb() -> float:
@@ -125,6 +128,11 @@ parser.add_argument(
     '--trial', type=int, default=-1,
     help='Trial number for output filename. When >= 0, output files become ahp_phold_*_part_trialY_TYPEX.json'
 )
+parser.add_argument(
+    '--ranks-in-process', type=int, default=0,
+    help='When running without SST with --write, write the JSON for every rank from this '
+         'invocation using this many worker processes (0: only --rank).'
+)
 parser.add_argument(
     '--architecture', type=str, default='spmd',
     help='Which architecture function to use: spmd or global (default: spmd)'
@@ -168,14 +176,32 @@ if SST:
     log_init(my_rank, num_ranks, sst.getThreadCount())
 
 
+# Link wiring messages are buffered while the graph is built and written out
+# once by flush_link_log(), rather than printed one line at a time.
+LINK_LOG = []
+
+# Whether the per-link wiring messages (level 2) are wanted at all; checked
+# before a message is formatted.
+LOG_LINKS = args.print_links or args.verbose >= 2
+
+
 def log_link(msg: str, level: int = 1) -> None:
     """Log link wiring if verbosity is sufficient or print-links is set."""
     if args.print_links or args.verbose >= level:
-        print(msg)
+        LINK_LOG.append(msg)
+
+
+def flush_link_log() -> None:
+    """Write out and clear the buffered link wiring messages."""
+    if LINK_LOG:
+        sys.stdout.write("\n".join(LINK_LOG) + "\n")
+        LINK_LOG.clear()
 
 NUM_RINGS = args.numRings
 SIDE = NUM_RINGS * 2 + 1
 MAX_SIZE = SIDE * SIDE
+# Border multi-port slots per column (see border_index)
+BORDER_COL_STRIDE = NUM_RINGS * NUM_RINGS * SIDE
 
 
 def port_num(src_i, src_j, dst_i, dst_j):
@@ -214,11 +240,19 @@ def border_index(col_j: int, dj: int, src_row_offset: int, tgt_row_offset: int)
     This ensures unique indices for each (source_row, target_row, col, dj) tuple.
     """
     # Allocate space for all combinations
-    # Each column gets NUM_RINGS * NUM_RINGS * SIDE slots
-    base = col_j * NUM_RINGS * NUM_RINGS * SIDE
-    # Within that, index by src_row_offset, tgt_row_offset, and dj
-    dj_idx = dj + NUM_RINGS  # Convert dj from [-R, R] to [0, 2R]
-    return base + src_row_offset * NUM_RINGS * SIDE + tgt_row_offset * SIDE + dj_idx
+    # Each column gets BORDER_COL_STRIDE = NUM_RINGS * NUM_RINGS * SIDE slots
+    base = col_j * BORDER_COL_STRIDE
+    return base + border_row_base(src_row_offset, tgt_row_offset) + dj
+
+
+def border_row_base(src_row_offset: int, tgt_row_offset: int) -> int:
+    """Return the part of border_index that depends only on the row offsets.
+
+    Includes the NUM_RINGS shift that converts dj from [-R, R] to [0, 2R], so
+    border_index(col_j, dj, s, t) == col_j * BORDER_COL_STRIDE + border_row_base(s, t) + dj.
+    Hot loops compute this once per row pair and add the column terms inline.
+    """
+    return src_row_offset * NUM_RINGS * SIDE + tgt_row_offset * SIDE + NUM_RINGS
 
 
 def index_to_offset(idx: int) -> tuple[int, int]:
@@ -230,6 +264,95 @@ def index_to_offset(idx: int) -> tuple[int, int]:
     return di, dj
 
 
+# Port number on a source for the neighbor at offset (di, dj), indexed as
+# PORT_TABLE[di + NUM_RINGS][dj + NUM_RINGS]; port_num only depends on the offset.
+PORT_TABLE = [
+    [port_num(0, 0, di, dj) for dj in range(-NUM_RINGS, NUM_RINGS + 1)]
+    for di in range(-NUM_RINGS, NUM_RINGS + 1)
+]
+
+# Interned port names indexed by port number, so wiring never formats a name.
+PORT_NAMES = tuple(sys.intern(f"port{pnum}") for pnum in range(MAX_SIZE))
+
+# Every offset within the ring neighborhood (including self) with its port
+# name, in (di, dj) order.
+FULL_STENCIL = [
+    (di, dj, PORT_NAMES[PORT_TABLE[di + NUM_RINGS][dj + NUM_RINGS]])
+    for di in range(-NUM_RINGS, NUM_RINGS + 1)
+    for dj in range(-NUM_RINGS, NUM_RINGS + 1)
+]
+
+# Definition shared by every Node port: optional, single-connection String port.
+_node_portinfo = PortInfo()
+_node_portinfo.add("port", "String", required=False)
+NODE_PORT = _node_portinfo["port"]
+
+# Node PortInfo by (up, down, left, right) distance to the grid edges, clipped
+# at NUM_RINGS; PortInfo is only read after construction, so nodes share them.
+PORTINFO_CACHE = {}
+
+# Node parameters that are the same for every node; each Node copies this and
+# fills in its own i and j.
+NODE_ATTR = {
+    "i": 0,
+    "j": 0,
+    "numRings": NUM_RINGS,
+    "eventDensity": args.eventDensity,
+    "multiplier": args.exponentMultiplier,
+    "smallPayload": args.smallPayload,
+    "largePayload": args.largePayload,
+    "largeEventFraction": args.largeEventFraction,
+    "componentSize": args.componentSize,
+    "timeToRun": args.timeToRun,
+    "verbose": args.verbose,
+    "rowCount": args.height,
+    "colCount": args.width
+}
+
+# Half of the stencil used for links inside a SubGrid: offsets above (or left
+# of, in the same row) the source, so each internal link is visited once, plus
+# the self-link unless disabled. Entries are (di, dj, src_port, tgt_port).
+HALF_STENCIL = [
+    (di, dj, pname, PORT_NAMES[PORT_TABLE[NUM_RINGS - di][NUM_RINGS - dj]])
+    for di, dj, pname in FULL_STENCIL
+    if di < 0 or (di == 0 and dj < 0)
+    or (di == 0 and dj == 0 and not args.no_self_links)
+]
+
+
+def imbalance_thread_map(M: int, imbalance_factor: float, thread_count: int) -> list:
+    """Return the thread id of every column index, as in phold_dist.py.
+
+    We allocate relative weights using an imbalance factor. A factor of 0
+    distributes evenly; 1.0 assigns all work to thread 0.
+
+    This copies imbalance_thread_map in phold_dist.py (SST loads each script
+    standalone); keep the two in sync. test_imbalance_thread_map.py checks
+    they agree.
+    """
+    first_weight = (1 + (thread_count - 1) * imbalance_factor) / thread_count
+    other_weight = first_weight - imbalance_factor
+    weights = [first_weight] + [other_weight] * (thread_count - 1)
+
+    buckets = [0.0]
+    for w in weights:
+        buckets.append(buckets[-1] + w * M)
+
+    # Columns past the last bucket (float rounding) go to the last thread.
+    return [
+        min(bisect.bisect_right(buckets, idx) - 1, thread_count - 1)
+        for idx in range(M)
+    ]
+
+
+# Thread of each column within a rank. The thread count is only known under
+# SST; otherwise nodes keep their subgrid's (default) thread.
+COL_THREADS = (
+    imbalance_thread_map(args.width, args.imbalance_factor, sst.getThreadCount())
+    if SST else None
+)
+
+
 class Node(Device):
     """PHOLD node device: exposes ports to neighbors within R rings."""
     library = args.nodeType
@@ -241,39 +364,25 @@ class Node(Device):
         """
         super().__init__(name)
         self.type = None
-        self.portinfo = PortInfo()
-        
-        # Iterate neighbor offsets within ring radius; include self (0,0).
-        for di in range(-NUM_RINGS, NUM_RINGS + 1):
-            for dj in range(-NUM_RINGS, NUM_RINGS + 1):
-                # Enforce ring boundary and allow self.
-                if (1 <= max(abs(di), abs(dj)) <= NUM_RINGS or
-                        (di == 0 and dj == 0)):
-                    # Neighbor coordinates.
-                    dst_i = i + di 
-                    dst_j = j + dj
-                    
-                    # Add port if neighbor is within the global grid.
-                    if 0 <= dst_i < args.height and 0 <= dst_j < args.width:
-                        pnum = port_num(i, j, dst_i, dst_j)
-                        pname = f"port{pnum}"
-                        self.portinfo.add(pname, "String", required=False)
-        
-        self.attr = {
-            "i": i,
-            "j": j,
-            "numRings": NUM_RINGS,
-            "eventDensity": args.eventDensity,
-            "multiplier": args.exponentMultiplier,
-            "smallPayload": args.smallPayload,
-            "largePayload": args.largePayload,
-            "largeEventFraction": args.largeEventFraction,
-            "componentSize": args.componentSize,
-            "timeToRun": args.timeToRun,
-            "verbose": args.verbose,
-            "rowCount": args.height,
-            "colCount": args.width
-        }
+        # Nodes with the same distances to the grid edges (clipped at
+        # NUM_RINGS) have the same ports, so they share one PortInfo.
+        key = (min(i, NUM_RINGS), min(args.height - 1 - i, NUM_RINGS),
+               min(j, NUM_RINGS), min(args.width - 1 - j, NUM_RINGS))
+        portinfo = PORTINFO_CACHE.get(key)
+        if portinfo is None:
+            up, down, left, right = key
+            # Add port if neighbor is within the global grid.
+            portinfo = PortInfo.fromkeys(
+                [pname for di, dj, pname in FULL_STENCIL
+                 if -up <= di <= down and -left <= dj <= right],
+                NODE_PORT,
+            )
+            PORTINFO_CACHE[key] = portinfo
+        self.portinfo = portinfo
+
+        self.attr = NODE_ATTR.copy()
+        self.attr["i"] = i
+        self.attr["j"] = j
 
 
 class SubGrid(Device):
@@ -291,7 +400,8 @@ class SubGrid(Device):
         super().__init__(name)
         self.row_start = row_start
         self.row_end = row_end
-        self.nodes = {}
+        # Child nodes in row-major order: (i, j) is at (i - row_start) * width + j
+        self.nodes = []
     
     def expand(self, graph: DeviceGraph) -> None:
         """Construct child nodes and wire internal and border links.
@@ -299,72 +409,70 @@ class SubGrid(Device):
         Internal links use a duplicate-avoid rule; border links are anchored
         via single representative connections per multi-port index.
         """
-        self.nodes = {}
+        # Ensure child nodes inherit the SubGrid's rank; the thread follows
+        # the column (see COL_THREADS) when running under SST.
+        partition = getattr(self, 'partition', None)
+        self.nodes = []
         for i in range(self.row_start, self.row_end):
-            self.nodes[i] = {}
             for j in range(args.width):
                 n = Node(f"comp_{i}_{j}", i, j)
-                # Ensure child nodes inherit the SubGrid's partition (rank, thread)
-                if getattr(self, 'partition', None) is not None:
-                    n.set_partition(self.partition[0], self.partition[1])
-                self.nodes[i][j] = n
+                if partition is not None:
+                    thread = partition[1] if COL_THREADS is None else COL_THREADS[j]
+                    n.set_partition(partition[0], thread)
+                self.nodes.append(n)
 
         M = args.width
     
-        # Defer border wiring to sweeps to avoid multi-link collisions.
+        # Internal links; neighbors outside this subgrid are handled by the
+        # border sweeps below. HALF_STENCIL only reaches the same or earlier
+        # rows, so each row keeps just the offsets whose neighbor row is at or
+        # after row_start (all of them from NUM_RINGS rows in), and only the
+        # column needs checking. Nodes NUM_RINGS columns from either edge skip
+        # that check too.
+        first_full_row = self.row_start + NUM_RINGS
+        interior_cols = range(NUM_RINGS, M - NUM_RINGS)
+        nodes = self.nodes
+        link = graph.link
+        delay = args.linkDelay
+        # HALF_STENCIL with each offset's distance in the flat node list
+        stencil = [
+            (di, dj, di * M + dj, src_port, tgt_port)
+            for di, dj, src_port, tgt_port in HALF_STENCIL
+        ]
         for i in range(self.row_start, self.row_end):
+            row_base = (i - self.row_start) * M
+            if i >= first_full_row:
+                row_stencil = stencil
+            else:
+                row_stencil = [entry for entry in stencil if i + entry[0] >= self.row_start]
             for j in range(M):
-                for di in range(-NUM_RINGS, NUM_RINGS + 1):
-                    for dj in range(-NUM_RINGS, NUM_RINGS + 1):
-                        # Enforce ring boundary.
-                        if max(abs(di), abs(dj)) > NUM_RINGS:
-                            continue
-
-                        ni = i + di
-                        nj = j + dj
+                src = row_base + j
+                src_node = nodes[src]
+                interior = j in interior_cols
+                for di, dj, step, src_port, tgt_port in row_stencil:
+                    nj = j + dj
+                    if not interior and not 0 <= nj < M:
+                        continue
+
+                    if LOG_LINKS:
+                        msg = (
+                            f"Internal link: {self.name}.comp_{i}_{j}."
+                            f"{src_port} <-> {self.name}.comp_{i + di}_{nj}."
+                            f"{tgt_port} (delay {args.linkDelay})"
+                        )
+                        log_link(msg, level=2)
 
-                        # Only consider in-bounds neighbors in global grid
-                        if not (0 <= ni < args.height and 0 <= nj < M):
-                            continue
-
-                        src_idx = port_num(i, j, ni, nj)
-                        tgt_idx = port_num(ni, nj, i, j)
-                        src_port = f"port{src_idx}"
-                        tgt_port = f"port{tgt_idx}"
-
-                        # Internal neighbor within this subgrid
-                        if self.row_start <= ni < self.row_end:
-                            # Self-link handling: include unless disabled
-                            if di == 0 and dj == 0:
-                                if args.no_self_links:
-                                    continue
-                            else:
-                                # Duplicate-avoid rule for non-self internal wiring
-                                if not (di < 0 or (di == 0 and dj < 0)):
-                                    continue
-
-                            if args.verbose >= 2:
-                                msg = (
-                                    f"Internal link: {self.name}.comp_{i}_{j}."
-                                    f"{src_port} <-> {self.name}.comp_{ni}_{nj}."
-                                    f"{tgt_port} (delay {args.linkDelay})"
-                                )
-                                log_link(msg, level=2)
-
-                            src_node = self.nodes[i][j]
-                            tgt_node = self.nodes[ni][nj]
-                            graph.link(
-                                getattr(src_node, src_port),
-                                getattr(tgt_node, tgt_port),
-                                args.linkDelay,
-                            )
-                        # Neighbor outside this subgrid: handled by border sweeps.
-                        elif 0 <= ni < args.height:
-                            continue
+                    link(
+                        src_node.port(src_port),
+                        nodes[src + step].port(tgt_port),
+                        delay,
+                    )
 
         # Single-link border sweeps: one anchor per border index.
         tops = list(range(self.row_start, min(self.row_start + NUM_RINGS, self.row_end)))
         bots = list(range(max(self.row_start, self.row_end - NUM_RINGS), self.row_end))
+        # nodes, link and delay are bound above for the internal links
+        border_port = self.port
         
         # North border sweep
         # Connect to neighbors above this subgrid
@@ -374,66 +482,129 @@ class SubGrid(Device):
         #   upper's src_row_offset = (upper.row_end - 1) - ni
         #   upper's tgt_row_offset = i - upper.row_end
         #   upper's bidx = border_index(nj, -dj, src_row_offset, tgt_row_offset)
-        for top in tops:
-            i = top
-            for j in range(args.width):
-                for di in range(-NUM_RINGS, 0):  # Only negative di (going up)
-                    for dj in range(-NUM_RINGS, NUM_RINGS + 1):
-                        if max(abs(di), abs(dj)) > NUM_RINGS:
-                            continue
-                        ni = i + di
+        # Only offsets that reach past this subgrid's rows and stay inside the
+        # grid are visited, so the sweeps need no per-offset bounds checks.
+        upper_row_end = self.row_start
+        for i in tops:
+            row_base = (i - self.row_start) * M
+            # Neighbor rows ni = i + di with 0 <= ni < self.row_start
+            di_range = range(max(-NUM_RINGS, -i), self.row_start - i)
+            # upper's target (this comp) is at row i
+            tgt_row_offset = i - upper_row_end
+            for j in range(M):
+                node = nodes[row_base + j]
+                dj_range = range(max(-NUM_RINGS, -j), min(NUM_RINGS, M - 1 - j) + 1)
+                for di in di_range:
+                    ni = i + di
+                    # Compute bidx from upper subgrid's south perspective:
+                    # upper.row_end = self.row_start, and upper's source was at row ni
+                    src_row_offset = (upper_row_end - 1) - ni
+                    offset_base = border_row_base(src_row_offset, tgt_row_offset)
+                    port_row = PORT_TABLE[di + NUM_RINGS]
+                    for dj in dj_range:
                         nj = j + dj
-                        # Only create border link if neighbor is above this subgrid
-                        if ni < self.row_start and 0 <= nj < args.width and 0 <= ni:
-                            # Compute bidx from upper subgrid's south perspective:
-                            # upper.row_end = self.row_start
-                            upper_row_end = self.row_start
-                            # upper's source was at row ni, column nj
-                            src_row_offset = (upper_row_end - 1) - ni
-                            # upper's target (this comp) is at row i
-                            tgt_row_offset = i - upper_row_end
-                            # upper used column nj and dj' = j - nj = -dj
-                            bidx = border_index(nj, -dj, src_row_offset, tgt_row_offset)
-                            nb = self.northBorder(bidx)
-                            src_idx = port_num(i, j, ni, nj)
-                            node = self.nodes[i][j]
-                            if args.verbose >= 2:
-                                msg = (
-                                    f"Border link (north): {self.name}.comp_{i}_{j}.port{src_idx} "
-                                    f"-> {self.name}.northBorder[{bidx}] (delay {args.linkDelay})"
-                                )
-                                log_link(msg, level=2)
-                            graph.link(getattr(node, f"port{src_idx}"), nb, args.linkDelay)
+                        # upper used column nj and dj' = j - nj = -dj:
+                        # border_index(nj, -dj, src_row_offset, tgt_row_offset)
+                        bidx = nj * BORDER_COL_STRIDE + offset_base - dj
+                        nb = border_port("northBorder", bidx)
+                        src_idx = port_row[dj + NUM_RINGS]
+                        if LOG_LINKS:
+                            msg = (
+                                f"Border link (north): {self.name}.comp_{i}_{j}.port{src_idx} "
+                                f"-> {self.name}.northBorder[{bidx}] (delay {args.linkDelay})"
+                            )
+                            log_link(msg, level=2)
+                        link(node.port(PORT_NAMES[src_idx]), nb, delay)
         
         # South border sweep
         # Connect to neighbors below this subgrid
         # source is comp at (i,j), target is at (i+di, j+dj) where di>0
-        for bot in bots:
-            i = bot
+        for i in bots:
+            row_base = (i - self.row_start) * M
+            # Neighbor rows ni = i + di with self.row_end <= ni < args.height
+            di_range = range(self.row_end - i, min(NUM_RINGS, args.height - 1 - i) + 1)
+            # src_row_offset: how far source is from bottom boundary
+            src_row_offset = (self.row_end - 1) - i
+            for j in range(M):
+                node = nodes[row_base + j]
+                dj_range = range(max(-NUM_RINGS, -j), min(NUM_RINGS, M - 1 - j) + 1)
+                for di in di_range:
+                    # tgt_row_offset: how far target is past the boundary
+                    tgt_row_offset = i + di - self.row_end
+                    # border_index(j, dj, src_row_offset, tgt_row_offset) without dj
+                    col_base = j * BORDER_COL_STRIDE + border_row_base(src_row_offset, tgt_row_offset)
+                    port_row = PORT_TABLE[di + NUM_RINGS]
+                    for dj in dj_range:
+                        bidx = col_base + dj
+                        sb = border_port("southBorder", bidx)
+                        src_idx = port_row[dj + NUM_RINGS]
+                        if LOG_LINKS:
+                            msg = (
+                                f"Border link (south): {self.name}.comp_{i}_{j}.port{src_idx} "
+                                f"-> {self.name}.southBorder[{bidx}] (delay {args.linkDelay})"
+                            )
+                            log_link(msg, level=2)
+                        link(node.port(PORT_NAMES[src_idx]), sb, delay)
+
+def subgrid_rows(index: int, num_boards: int) -> tuple[int, int]:
+    """Return the [row_start, row_end) rows of SubGrid `index`.
+
+    Rows are divided evenly among boards; the first height % num_boards
+    boards get one extra row, so sizes differ by at most one.
+    """
+    rows_per, extra = divmod(args.height, num_boards)
+    row_start = index * rows_per + min(index, extra)
+    return row_start, row_start + rows_per + (1 if index < extra else 0)
+
+
+def border_plan() -> list[int]:
+    """Return the border indices linked across every SubGrid boundary, in order.
+
+    The indices depend only on the grid width and NUM_RINGS, not on which
+    SubGrids meet, so they are enumerated once and reused for each boundary.
+    """
+    plan = []
+    # For each source row in upper's bottom region that can reach into lower
+    for src_row_offset in range(NUM_RINGS):
+        # src_row is (upper.row_end - 1) - src_row_offset
+        # For each target row in lower's top region
+        for tgt_row_offset in range(NUM_RINGS):
+            # tgt_row is lower.row_start + tgt_row_offset
+            # Total vertical distance = src_row_offset + 1 + tgt_row_offset
+            total_di = src_row_offset + 1 + tgt_row_offset
+            if total_di > NUM_RINGS:
+                continue  # Beyond ring neighborhood
+            offset_base = border_row_base(src_row_offset, tgt_row_offset)
             for j in range(args.width):
-                for di in range(1, NUM_RINGS + 1):  # Only positive di (going down)
-                    for dj in range(-NUM_RINGS, NUM_RINGS + 1):
-                        if max(di, abs(dj)) > NUM_RINGS:
-                            continue
-                        ni = i + di
-                        nj = j + dj
-                        # Only create border link if neighbor is below this subgrid
-                        if ni >= self.row_end and 0 <= nj < args.width and ni < args.height:
-                            # src_row_offset: how far source is from bottom boundary
-                            src_row_offset = (self.row_end - 1) - i
-                            # tgt_row_offset: how far target is past the boundary  
-                            tgt_row_offset = ni - self.row_end
-                            bidx = border_index(j, dj, src_row_offset, tgt_row_offset)
-                            sb = self.southBorder(bidx)
-                            src_idx = port_num(i, j, ni, nj)
-                            node = self.nodes[i][j]
-                            if args.verbose >= 2:
-                                msg = (
-                                    f"Border link (south): {self.name}.comp_{i}_{j}.port{src_idx} "
-                                    f"-> {self.name}.southBorder[{bidx}] (delay {args.linkDelay})"
-                                )
-                                log_link(msg, level=2)
-                            graph.link(getattr(node, f"port{src_idx}"), sb, args.linkDelay)
+                # border_index(j, dj, src_row_offset, tgt_row_offset) without dj
+                col_base = j * BORDER_COL_STRIDE + offset_base
+                # Column offsets whose target column j + dj is inside the grid
+                plan.extend(
+                    col_base + dj
+                    for dj in range(max(-NUM_RINGS, -j), min(NUM_RINGS, args.width - 1 - j) + 1)
+                )
+    return plan
+
+
+def link_borders(graph: DeviceGraph, upper: SubGrid, lower: SubGrid, plan: list[int]) -> None:
+    """Link the south border ports of `upper` to the north border ports of `lower`.
+
+    plan is the list of border indices from border_plan().
+    """
+    # Bound once, since this runs for every border index of every boundary
+    link = graph.link
+    upper_port = upper.port
+    lower_port = lower.port
+    delay = args.linkDelay
+    for bidx in plan:
+        if LOG_LINKS:
+            msg = (
+                f"Inter-subgrid link: {upper.name}.southBorder[{bidx}] "
+                f"<-> {lower.name}.northBorder[{bidx}] (delay {args.linkDelay})"
+            )
+            log_link(msg, level=2)
+        link(upper_port("southBorder", bidx),
+             lower_port("northBorder", bidx), delay)
 
 
 def architecture_spmd(num_boards: int) -> DeviceGraph:
@@ -445,18 +616,13 @@ def architecture_spmd(num_boards: int) -> DeviceGraph:
     graph = DeviceGraph()
     subgrids = {}
 
-    # Divide rows evenly among boards; last gets remainder.
-    rows_per = args.height // num_boards if num_boards > 0 else args.height
-    
     # Only create SubGrids for [my_rank-1, my_rank, my_rank+1]
     # This is sufficient because cross-border links only span adjacent partitions
     start_idx = max(0, my_rank - 1)
     end_idx = min(num_boards, my_rank + 2)  # exclusive upper bound
     
     for i in range(start_idx, end_idx):
-        row_start = i * rows_per
-        row_end = (i + 1) * rows_per if i != num_boards - 1 else args.height
-        sub = SubGrid(f"SubGrid{i}", row_start, row_end)
+        sub = SubGrid(f"SubGrid{i}", *subgrid_rows(i, num_boards))
         sub.set_partition(i)
         graph.add(sub)
         subgrids[i] = sub
@@ -469,6 +635,7 @@ def architecture_spmd(num_boards: int) -> DeviceGraph:
     # For 2 ranks: rank 0 connects to rank 1, rank 1 connects to rank 0
     border_start = max(1, my_rank)
     border_end = min(num_boards, my_rank + 2)
+    plan = border_plan()
     
     for i in range(border_start, border_end):
         # Only process if both SubGrids exist in our local map
@@ -476,35 +643,7 @@ def architecture_spmd(num_boards: int) -> DeviceGraph:
             continue
         upper = subgrids[i - 1]
         lower = subgrids[i]
-        # For each source row in upper's bottom region that can reach into lower
-        for src_row_offset in range(NUM_RINGS):
-            # src_row is (upper.row_end - 1) - src_row_offset
-            # For each target row in lower's top region
-            for tgt_row_offset in range(NUM_RINGS):
-                # tgt_row is lower.row_start + tgt_row_offset
-                # Total vertical distance = src_row_offset + 1 + tgt_row_offset
-                total_di = src_row_offset + 1 + tgt_row_offset
-                if total_di > NUM_RINGS:
-                    continue  # Beyond ring neighborhood
-                for j in range(args.width):
-                    for dj in range(-NUM_RINGS, NUM_RINGS + 1):
-                        if max(total_di, abs(dj)) > NUM_RINGS:
-                            continue
-                        jj = j + dj
-                        if not (0 <= jj < args.width):
-                            continue
-                        bidx = border_index(j, dj, src_row_offset, tgt_row_offset)
-                        if args.verbose >= 2:
-                            msg = (
-                                f"Inter-subgrid link: {upper.name}.southBorder[{bidx}] "
-                                f"<-> {lower.name}.northBorder[{bidx}] (delay {args.linkDelay})"
-                            )
-                            log_link(msg, level=2)
-                        graph.link(
-                            upper.southBorder(bidx),
-                            lower.northBorder(bidx), 
-                            args.linkDelay
-                        )
+        link_borders(graph, upper, lower, plan)
 
     return graph
 
@@ -514,50 +653,19 @@ def architecture_global(num_boards: int) -> DeviceGraph:
     graph = DeviceGraph()
     subgrids = {}
 
-    # Divide rows evenly among boards; last gets remainder.
-    rows_per = args.height // num_boards if num_boards > 0 else args.height
     for i in range(num_boards):
-        row_start = i * rows_per
-        row_end = (i + 1) * rows_per if i != num_boards - 1 else args.height
-        sub = SubGrid(f"SubGrid{i}", row_start, row_end)
+        sub = SubGrid(f"SubGrid{i}", *subgrid_rows(i, num_boards))
         sub.set_partition(i)
         graph.add(sub)
         subgrids[i] = sub
 
     # Connect borders between adjacent SubGrids.
     # Iterate over all possible cross-boundary connections.
+    plan = border_plan()
     for i in range(1, num_boards):
         upper = subgrids[i - 1]
         lower = subgrids[i]
-        # For each source row in upper's bottom region that can reach into lower
-        for src_row_offset in range(NUM_RINGS):
-            # src_row is (upper.row_end - 1) - src_row_offset
-            # For each target row in lower's top region
-            for tgt_row_offset in range(NUM_RINGS):
-                # tgt_row is lower.row_start + tgt_row_offset
-                # Total vertical distance = src_row_offset + 1 + tgt_row_offset
-                total_di = src_row_offset + 1 + tgt_row_offset
-                if total_di > NUM_RINGS:
-                    continue  # Beyond ring neighborhood
-                for j in range(args.width):
-                    for dj in range(-NUM_RINGS, NUM_RINGS + 1):
-                        if max(total_di, abs(dj)) > NUM_RINGS:
-                            continue
-                        jj = j + dj
-                        if not (0 <= jj < args.width):
-                            continue
-                        bidx = border_index(j, dj, src_row_offset, tgt_row_offset)
-                        if args.verbose >= 2:
-                            msg = (
-                                f"Inter-subgrid link: {upper.name}.southBorder[{bidx}] "
-                                f"<-> {lower.name}.northBorder[{bidx}] (delay {args.linkDelay})"
-                            )
-                            log_link(msg, level=2)
-                        graph.link(
-                            upper.southBorder(bidx),
-                            lower.northBorder(bidx), 
-                            args.linkDelay
-                        )
+        link_borders(graph, upper, lower, plan)
 
     return graph
 
@@ -573,18 +681,59 @@ def architecture(num_boards: int) -> DeviceGraph:
 if not (args.write or args.build or args.draw):
     args.build = True
 
-if sum([args.write, args.build, args.draw]) > 1:
+if args.write + args.build + args.draw > 1:
     raise SystemExit("Error: Only one of --write, --build, or --draw can be specified.") 
 
 if args.draw:
     raise SystemExit("Error: --draw is not implemented.")
 
+
+def write_python_json(sst_graph: SSTGraph, rank: int) -> None:
+    """Write the JSON for `rank` when running without SST."""
+    total_ranks = num_nodes * num_ranks
+    if args.partitioner.lower() == 'sst' and args.write:
+        if args.trial >= 0:
+            sst_graph.write_json(f'ahp_phold_sst_part_trial{args.trial}_python.json', output=output_dir, nranks=total_ranks, rank=rank)
+        else:
+            sst_graph.write_json('ahp_phold_sst_part_python.json', output=output_dir, nranks=total_ranks, rank=rank)
+    elif args.partitioner.lower() == 'ahp_graph' and args.write:
+        if args.trial >= 0:
+            sst_graph.write_json(f'ahp_phold_ahp_part_trial{args.trial}_python.json', output=output_dir, nranks=total_ranks, rank=rank)
+        else:
+            sst_graph.write_json('ahp_phold_ahp_part_python.json', output=output_dir, nranks=total_ranks, rank=rank)
+    else:
+        raise SystemExit("Error: Invalid partitioner or missing action (--write).")
+
+
+def build_and_write(rank: int) -> None:
+    """Build the graph for `rank` and write its JSON; runs in a worker process."""
+    global my_rank
+    my_rank = rank
+    graph_start = time.time()
+    graph = architecture(num_nodes*num_ranks)
+    flush_link_log()
+    print(f"ahp_graph construction on rank {rank} takes {time.time() - graph_start:.3f} seconds, memory: {get_memory_gb():.2f} GB")
+    write_python_json(SSTGraph(graph), rank)
+    flush_link_log()
+
+
+if not SST and args.ranks_in_process > 0:
+    if not args.write:
+        raise SystemExit("Error: --ranks-in-process requires --write.")
+    # Every rank's graph is built independently, so each is a separate task.
+    # Workers are forked so they inherit the parsed arguments and classes.
+    with ProcessPoolExecutor(max_workers=args.ranks_in_process,
+                             mp_context=multiprocessing.get_context('fork')) as executor:
+        list(executor.map(build_and_write, range(num_nodes*num_ranks)))
+    raise SystemExit(0)
+
 ahp_graph_start = time.time()
 if SST:
     ahp_graph = architecture(num_ranks)
 else:
     ahp_graph = architecture(num_nodes*num_ranks)
 ahp_graph_end = time.time()
+flush_link_log()
 print(f"ahp_graph construction on rank {my_rank} takes {ahp_graph_end - ahp_graph_start:.3f} seconds, memory: {get_memory_gb():.2f} GB")
 print(f"ahp_graph on rank {my_rank} has {len(ahp_graph.links)} links")
 
@@ -618,16 +767,5 @@ if SST:
     else:
         raise SystemExit("Error: Invalid partitioner or missing action (--build or --write).")
 else:
-    total_ranks = num_nodes * num_ranks
-    if args.partitioner.lower() == 'sst' and args.write:
-        if args.trial >= 0:
-            sst_graph.write_json(f'ahp_phold_sst_part_trial{args.trial}_python.json', output=output_dir, nranks=total_ranks, rank=my_rank)
-        else:
-            sst_graph.write_json('ahp_phold_sst_part_python.json', output=output_dir, nranks=total_ranks, rank=my_rank)
-    elif args.partitioner.lower() == 'ahp_graph' and args.write:
-        if args.trial >= 0:
-            sst_graph.write_json(f'ahp_phold_ahp_part_trial{args.trial}_python.json', output=output_dir, nranks=total_ranks, rank=my_rank)
-        else:
-            sst_graph.write_json('ahp_phold_ahp_part_python.json', output=output_dir, nranks=total_ranks, rank=my_rank)
-    else:
-        raise SystemExit("Error: Invalid partitioner or missing action (--write).")
\ No newline at end of file
+    write_python_json(sst_graph, my_rank)
+flush_link_log()
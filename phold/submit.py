@@ -2,10 +2,14 @@ import math
 import argparse
 import itertools
 import subprocess
+import shlex
 import os
+import sys
 import random
+import time
+
+from concurrent.futures import ThreadPoolExecutor
 
-working_dir = os.getcwd()
 script_dir = os.path.dirname(os.path.realpath(__file__))
 
 def int_list(value: str) -> list[int]:
@@ -53,9 +57,12 @@ def float_list(value: str) -> list[float]:
   except ValueError:
     raise argparse.ArgumentTypeError(f"Invalid list of floats: '{value}'")
 
-def parse_arguments() -> argparse.Namespace:
+def parse_arguments(argv: list[str] | None = None) -> argparse.Namespace:
   """Parse and validate command-line arguments for PHOLD benchmark submission.
   
+  Args:
+      argv: Arguments to parse instead of sys.argv[1:].
+
   Raises:
       AssertionError: If neither --width nor --components-per-node is specified.
       SystemExit: If parsing fails or required arguments are missing.
@@ -75,6 +82,9 @@ def parse_arguments() -> argparse.Namespace:
   parser.add_argument('--large_payloads', '--large-payloads', '--large-payload', type=int_list, default=[1024], help="List of large payload sizes in bytes, e.g., '1024 2048 4096'. Default is [1024].")
   parser.add_argument('--large_event_fractions', '--large-event-fractions', '--large-event-fraction', type=float_list, default=[0.0], help="List of fractions of large events, e.g., '0.1 0.2 0.5'. Default is [0.1].")
   parser.add_argument('--dry_run', '--dry-run', action='store_true', help="If set, only print the commands that would be run without executing them.")
+  parser.add_argument('--fanout', type=int, default=64, help="Maximum number of sbatch submissions (or array tasks, with --array) to have in flight at once. Default is 64.")
+  parser.add_argument('--array', action='store_true', help="If set, submit one SLURM array job per node count instead of one job per run. \
+                      The runs for each array job are listed in a manifest file, named after the submission time, in the working directory.")
   parser.add_argument('--name', type=str, default="phold", help="(Optional) Name of the benchmark job prepended to output files.")
   parser.add_argument('--imbalance_factors', '--imbalance-factors', '--imbalance-factor', type=float_list, default=[0.0], help="List of imbalance fractions to use, e.g., '0.1 0.2 0.5'. Default is [0.0].")
   parser.add_argument('--component_sizes', '--component-sizes', '--component-size', type=int_list, default=[0], help="List of component sizes to use, in bytes. Default is [0]")
@@ -90,7 +100,7 @@ def parse_arguments() -> argparse.Namespace:
                       per-node heights rather. If not, then the height parameters are treated as the total grid height.")
   parser.add_argument('--stochastic', type=int, help="If set, treat the arguments to this script as integer constants or range bounds, \
                       rather than lists of values. The value of this variable is the number of points in the resulting space to sample.")
-  args = parser.parse_args()
+  args = parser.parse_args(argv)
   assert(args.widths is not None or args.components_per_node is not None), "Either --width or --components-per-node must be specified."
   return args
 
@@ -182,30 +192,28 @@ def stochastic_grid_shapes(args):
 # The weak scaling determines if the "height" parameter is a per-node value or the entire grid.
 def calculate_grid_shapes(args):
   '''
-  Creates a list of tuples representing the global grid shape and node counts for the different runs.
+  Creates an iterator of tuples representing the global grid shape and node counts for the different runs.
   Each tuple is (width, height, node_count, rank_count, thread_count)
   '''
-  shapes = []
-  if not args.weak_scaling and args.components_per_node is None:
-    return list(itertools.product(args.widths, args.heights, args.node_counts, args.rank_counts, args.thread_counts))
-  elif args.components_per_node is None:
+  if args.components_per_node is None:
+    shapes = itertools.product(args.widths, args.heights, args.node_counts, args.rank_counts, args.thread_counts)
+    if not args.weak_scaling:
+      return shapes
     # Weak scaling on height per node
-    for per_node_width, per_node_height, node_count, rank_count, thread_count in itertools.product(args.widths, args.heights, args.node_counts, args.rank_counts, args.thread_counts):
-      shapes.append((per_node_width, per_node_height * node_count, node_count, rank_count, thread_count))
-  elif not args.weak_scaling:
-    # Weak scaling
-    for per_node_component_count, grid_height, node_count, rank_count, thread_count in itertools.product(args.components_per_node, args.heights, args.node_counts, args.rank_counts, args.thread_counts):
-      component_count = node_count * per_node_component_count
-      grid_width = math.ceil(component_count / grid_height)
-      shapes.append((grid_width, grid_height, node_count, rank_count, thread_count))
+    return ((per_node_width, per_node_height * node_count, node_count, rank_count, thread_count)
+            for per_node_width, per_node_height, node_count, rank_count, thread_count in shapes)
   else:
-    # We are weak scaling and using a per-node component count.
-    for per_node_component_count, per_node_height, node_count, rank_count, thread_count in itertools.product(args.components_per_node, args.heights, args.node_counts, args.rank_counts, args.thread_counts):
-      component_count = node_count * per_node_component_count
-      grid_height = per_node_height * node_count
-      grid_width = math.ceil(component_count / grid_height)
-      shapes.append((grid_width, grid_height, node_count, rank_count, thread_count))
-  return shapes
+    return (_component_grid_shape(args, *shape)
+            for shape in itertools.product(args.components_per_node, args.heights, args.node_counts, args.rank_counts, args.thread_counts))
+
+def _component_grid_shape(args, per_node_component_count, height, node_count, rank_count, thread_count):
+  '''
+  Grid shape for a run given a per-node component count. With weak scaling, `height` is per node.
+  '''
+  component_count = node_count * per_node_component_count
+  grid_height = height * node_count if args.weak_scaling else height
+  grid_width = math.ceil(component_count / grid_height)
+  return (grid_width, grid_height, node_count, rank_count, thread_count)
 
 def generate_parameter_list(args):
   """
@@ -325,23 +333,94 @@ def generate_phold_args(node_counts=[1], thread_counts=[1], rank_counts=[1],
     arg_tuples.append((srun_args, sst_args, phold_args, run_name))
   return arg_tuples
 
-if __name__ == "__main__":
-  args = parse_arguments()
+def write_manifest(path: str, dispatch_arg_lists: list[list[str]]) -> None:
+  """Write one tab-separated line of dispatch.sh arguments per array task.
 
-  os.chdir(script_dir)
-  subprocess.run("make", shell=True, check=True)
-  os.chdir(working_dir)
+  Line k (0-indexed) is run by the task with SLURM_ARRAY_TASK_ID=k, see dispatch-array.sh.
+  """
+  # 'x' refuses to replace a manifest that pending array tasks may still read.
+  with open(path, 'x') as f:
+    for dispatch_args in dispatch_arg_lists:
+      f.write('\t'.join(dispatch_args) + "\n")
+
+def batch_script(directives: list[str], command: list[str]) -> str:
+  """Build an sbatch script that runs a single command.
+
+  Args:
+    directives: sbatch options, each emitted on its own `#SBATCH` line.
+    command: The program and arguments to exec from the job.
+
+  Returns:
+    The script text, to be passed to sbatch on stdin.
+  """
+  lines = ["#!/bin/bash"]
+  lines += [f"#SBATCH {directive}" for directive in directives]
+  # sbatch spools stdin scripts, so tell the dispatch scripts where the sources live.
+  lines.append(f"export PHOLD_SCRIPT_DIR={shlex.quote(script_dir)}")
+  lines.append(f"exec {shlex.join(command)}")
+  return "\n".join(lines) + "\n"
+
+def submit_job(script: str) -> None:
+  """Submit a single batch script to sbatch via stdin, without going through a shell."""
+  print(f"Submitting:\n{script}")
+  subprocess.run(["sbatch"], input=script, text=True, check=True)
+
+def main(argv: list[str] | None = None) -> None:
+  """Build PHOLD and submit (or, with --dry_run, print) the jobs for a parameter sweep.
+
+  Args:
+      argv: Command-line arguments, e.g. ["--node-counts", "1 2", "--width", "100"]. Defaults to sys.argv[1:].
+  """
+  args = parse_arguments(argv)
+
+  # `install` always reruns sst-register, so only query the library itself and skip make when it is current.
+  if subprocess.run(["make", "-C", script_dir, "-q", "libphold.so"]).returncode != 0:
+    subprocess.run(["make", "-C", script_dir], check=True)
 
   parameters = generate_parameter_list(args)
 
   print("parameters: ", parameters)
+  runs = [] # (node_count, output_file, dispatch.sh arguments) for each run
   for ((width, height, node_count, rank_count, thread_count), 
        (event_density, ring_size, time_to_run, small_payload, large_payload, large_event_fraction, imbalance_factor, component_size, component_computation)) in parameters:
     output_file = f"{args.name}_{node_count}_{rank_count}_{thread_count}_{width}_{height}_{event_density}_{ring_size}_{time_to_run}_{small_payload}_{large_payload}_{large_event_fraction}_{imbalance_factor}_{component_size}_{component_computation}"
-    sbatch_portion = f"sbatch -N {node_count} -o {output_file}.out"
-    command = f"{sbatch_portion} {script_dir}/dispatch.sh {node_count} {rank_count} {thread_count} {width} {height} {event_density} {ring_size} {time_to_run} {small_payload} {large_payload} {large_event_fraction} {imbalance_factor} {component_size} {component_computation} {output_file}"
-    print(command)
-    if not args.dry_run:
-      print(f"Running: {command}")
-      subprocess.run(command, shell=True, check=True)
-      
\ No newline at end of file
+    dispatch_args = [node_count, rank_count, thread_count, width, height, event_density, ring_size, time_to_run,
+                     small_payload, large_payload, large_event_fraction, imbalance_factor, component_size, component_computation, output_file]
+    runs.append((node_count, output_file, [str(a) for a in dispatch_args]))
+
+  commands = []
+  if args.array:
+    # Array tasks share a single resource request, so runs are grouped by node count.
+    groups = {}
+    for node_count, output_file, dispatch_args in runs:
+      groups.setdefault(node_count, []).append(dispatch_args)
+    # Each submission gets its own manifests, so resubmitting a sweep cannot change the runs of pending tasks.
+    # The pid keeps two submissions started in the same second apart.
+    stamp = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+    manifests = {node_count: os.path.abspath(f"{args.name}_{node_count}_{stamp}_manifest.tsv") for node_count in groups}
+    # Check every path before writing any, so a clash never leaves a half-written sweep.
+    existing = [manifest for manifest in manifests.values() if os.path.exists(manifest)]
+    if existing:
+      sys.exit(f"Refusing to overwrite existing manifest(s): {', '.join(existing)}. Nothing was submitted.")
+    for node_count, group in groups.items():
+      manifest = manifests[node_count]
+      if not args.dry_run:
+        write_manifest(manifest, group)
+      script = batch_script([f"--array=0-{len(group) - 1}%{args.fanout}", f"-J {args.name}", f"-N {node_count}", "-o %x_%A_%a.out"],
+                            [f"{script_dir}/dispatch-array.sh", manifest])
+      print(script)
+      commands.append(script)
+  else:
+    for node_count, output_file, dispatch_args in runs:
+      script = batch_script([f"-J {args.name}", f"-N {node_count}", f"-o {output_file}.out"],
+                            [f"{script_dir}/dispatch.sh"] + dispatch_args)
+      print(script)
+      commands.append(script)
+
+  if not args.dry_run:
+    # sbatch calls are latency bound, so overlap them with a bounded number of threads.
+    with ThreadPoolExecutor(max_workers=args.fanout) as executor:
+      list(executor.map(submit_job, commands))
+
+if __name__ == "__main__":
+  main()
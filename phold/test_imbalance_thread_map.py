@@ -0,0 +1,45 @@
+"""Check that phold_dist.py and phold_dist_ahp.py map columns to threads alike.
+
+Both scripts run their whole model at import time and need SST (or AHP), so
+each copy of imbalance_thread_map is compiled on its own from the source.
+"""
+
+import ast
+import bisect
+import os
+import unittest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_function(script: str, name: str):
+    """Compile the top-level function `name` from `script` by itself."""
+    path = os.path.join(HERE, script)
+    with open(path) as f:
+        tree = ast.parse(f.read(), path)
+    node = next(
+        n for n in tree.body if isinstance(n, ast.FunctionDef) and n.name == name
+    )
+    namespace = {"bisect": bisect}
+    exec(compile(ast.Module(body=[node], type_ignores=[]), path, "exec"), namespace)
+    return namespace[name]
+
+
+class ImbalanceThreadMapTest(unittest.TestCase):
+
+    def test_scripts_agree(self):
+        og_map = load_function("phold_dist.py", "imbalance_thread_map")
+        ahp_map = load_function("phold_dist_ahp.py", "imbalance_thread_map")
+        for width in (1, 2, 7, 10, 64, 100, 1000):
+            for factor in (0.0, 0.1, 0.3, 0.5, 0.9, 1.0):
+                for threads in (1, 2, 3, 4, 8, 16):
+                    og = og_map(width, factor, threads)
+                    self.assertEqual(
+                        [og(j) for j in range(width)],
+                        ahp_map(width, factor, threads),
+                        (width, factor, threads),
+                    )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+"""Tests for verify_correctness_ahp.py that need no SST or launcher."""
+
+import time
+import unittest
+from unittest import mock
+
+import verify_correctness_ahp as verify
+
+
+def fake_launcher(script: str):
+    """Return a build_launcher_command stand-in that runs `script` in sh."""
+    return lambda *args: ["sh", "-c", script]
+
+
+class RunSimulationTimeoutTest(unittest.TestCase):
+    """The timeout must bound run_simulation even when a forked child of the
+    launcher (like an MPI rank) keeps the output pipe open."""
+
+    def run_with_timeout(self, script: str):
+        with mock.patch.object(verify, "build_launcher_command", fake_launcher(script)), \
+             mock.patch.object(verify, "SIMULATION_TIMEOUT", 1):
+            start = time.monotonic()
+            result = verify.run_simulation("phold_dist.py", 8, 8, 1, 1, 1)
+            return result, time.monotonic() - start
+
+    def test_launcher_waiting_on_forked_child(self):
+        (counts, output, exit_code), elapsed = self.run_with_timeout(
+            "echo 0,1:5; sleep 30 & wait"
+        )
+        self.assertLess(elapsed, 10)
+        self.assertEqual(exit_code, -1)
+        self.assertEqual(output, "TIMEOUT (30 min)")
+        self.assertEqual(counts, {(0, 1): 5})
+
+    def test_launcher_exits_before_forked_child(self):
+        (_, output, exit_code), elapsed = self.run_with_timeout(
+            "sleep 30 & exit 0"
+        )
+        self.assertLess(elapsed, 10)
+        self.assertEqual(exit_code, -1)
+        self.assertEqual(output, "TIMEOUT (30 min)")
+
+    def test_completes_within_timeout(self):
+        (counts, output, exit_code), _ = self.run_with_timeout(
+            "echo starting; echo 2,3:7; exit 3"
+        )
+        self.assertEqual(exit_code, 3)
+        self.assertEqual(output, "starting\n")
+        self.assertEqual(counts, {(2, 3): 7})
+
+
+if __name__ == "__main__":
+    unittest.main()
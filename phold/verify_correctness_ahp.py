@@ -5,15 +5,38 @@ Correctness tests comparing phold_dist_ahp.py to phold_dist.py.
 Verifies that recvCount values match for each (i,j) component.
 """
 
-import re
+import functools
+import hashlib
+import heapq
+import json
+import os
 import shutil
+import signal
 import subprocess
 import sys
-from typing import Dict, List, Optional, Tuple
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional, Sequence, Tuple
 
 
 SUPPORTED_ARCHITECTURES = ["spmd", "global"]
 
+# 30 minute timeout for HPC queue wait
+SIMULATION_TIMEOUT = 1800
+# Bytes of non-recvCount output kept for error messages
+OUTPUT_HEAD = 500
+# Parsed recvCounts of earlier phold_dist.py runs, one JSON file per config
+CACHE_DIR = ".verify_cache"
+# One lock per cache key, so a config is only simulated once per process
+_CACHE_LOCKS: Dict[str, threading.Lock] = {}
+
+
+@functools.cache
+def launcher_path(name: str) -> Optional[str]:
+    """Resolve a launcher on PATH once per process; None if it is missing."""
+    return shutil.which(name)
+
 
 def build_launcher_command(
     launcher: str,
@@ -26,18 +49,19 @@ def build_launcher_command(
     total_ranks = num_nodes * num_ranks_per_node
 
     if launcher == "auto":
-        if shutil.which("srun"):
+        if launcher_path("srun"):
             launcher = "srun"
-        elif shutil.which("mpirun"):
+        elif launcher_path("mpirun"):
             launcher = "mpirun"
         else:
             raise ValueError("Neither srun nor mpirun is available")
 
     if launcher == "srun":
-        if not shutil.which("srun"):
+        srun = launcher_path("srun")
+        if not srun:
             raise ValueError("Requested launcher 'srun' is not available")
         return [
-            "srun",
+            srun,
             "-N",
             str(num_nodes),
             "--ntasks-per-node",
@@ -45,27 +69,40 @@ def build_launcher_command(
         ]
 
     if launcher == "mpirun":
-        if not shutil.which("mpirun"):
+        mpirun = launcher_path("mpirun")
+        if not mpirun:
             raise ValueError("Requested launcher 'mpirun' is not available")
-        return ["mpirun", "-np", str(total_ranks)]
+        return [mpirun, "-np", str(total_ranks)]
 
     raise ValueError(f"Unsupported launcher: {launcher}")
 
 
-def parse_recv_counts(output: str) -> Dict[Tuple[int, int], int]:
+def parse_recv_line(line: bytes) -> Optional[Tuple[int, int, int]]:
+    """Parse one b"X,Y:count" line into (row, col, count), or None."""
+    # Nearly all lines are SST log output; only count lines start with a digit.
+    # bytes.isdigit is ASCII-only, matching what int() accepts here.
+    if not line[:1].isdigit():
+        return None
+    pos, _, count = line.partition(b':')
+    if not count.isdigit():
+        return None
+    row, _, col = pos.partition(b',')
+    if row.isdigit() and col.isdigit():
+        return int(row), int(col), int(count)
+    return None
+
+
+def parse_recv_counts(output: bytes) -> Dict[Tuple[int, int], int]:
     """Parse recvCount values from simulation output.
     
     Output format: "X,Y:count" where X is row, Y is column.
     Returns dict mapping (row, col) -> count.
     """
     counts = {}
-    # Match lines like "1,3:132" or "0,0:98"
-    pattern = re.compile(r'^(\d+),(\d+):(\d+)$', re.MULTILINE)
-    for match in pattern.finditer(output):
-        row = int(match.group(1))
-        col = int(match.group(2))
-        count = int(match.group(3))
-        counts[(row, col)] = count
+    for line in output.splitlines():
+        parsed = parse_recv_line(line)
+        if parsed is not None:
+            counts[parsed[:2]] = parsed[2]
     return counts
 
 
@@ -73,8 +110,12 @@ def run_simulation(script: str, height: int, width: int, num_rings: int,
                    num_nodes: int, num_ranks_per_node: int,
                    time_to_run: str = "1000ns",
                    extra_args: Optional[List[str]] = None,
-                   launcher: str = "auto") -> Tuple[str, int]:
-    """Run a PHOLD simulation and return (output, exit_code).
+                   launcher: str = "auto",
+                   ) -> Tuple[Dict[Tuple[int, int], int], str, int]:
+    """Run a PHOLD simulation and return (counts, output, exit_code).
+    
+    The output is streamed as bytes and parsed as it arrives. Only the first
+    OUTPUT_HEAD bytes of the other lines are kept, for error messages.
     """
     try:
         cmd = build_launcher_command(launcher, num_nodes, num_ranks_per_node) + [
@@ -88,23 +129,57 @@ def run_simulation(script: str, height: int, width: int, num_rings: int,
         "--verbose=1",  # Enable recvCount output
         ]
     except ValueError as error:
-        return f"ERROR: {error}", -1
+        return {}, f"ERROR: {error}", -1
     
     if extra_args:
         cmd.extend(extra_args)
     
+    counts = {}
+    head = []
+    head_len = 0
+    timed_out = threading.Event()
     try:
-        result = subprocess.run(
+        with subprocess.Popen(
             cmd,
-            capture_output=True,
-            text=True,
-            timeout=1800,  # 30 minute timeout for HPC queue wait
-        )
-        return result.stdout + result.stderr, result.returncode
-    except subprocess.TimeoutExpired:
-        return "TIMEOUT (30 min)", -1
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            bufsize=1 << 16,
+            # Own process group, so the launcher and every rank under it can
+            # be killed together; any of them may hold the pipe open
+            start_new_session=True,
+        ) as proc:
+            def kill_group():
+                try:
+                    os.killpg(proc.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+
+            def expire():
+                timed_out.set()
+                kill_group()
+
+            timer = threading.Timer(SIMULATION_TIMEOUT, expire)
+            timer.start()
+            try:
+                for line in proc.stdout:
+                    parsed = parse_recv_line(line.rstrip(b'\r\n'))
+                    if parsed is not None:
+                        counts[parsed[:2]] = parsed[2]
+                    elif head_len < OUTPUT_HEAD:
+                        head.append(line)
+                        head_len += len(line)
+                exit_code = proc.wait()
+            finally:
+                timer.cancel()
+                # Interrupted (e.g. Ctrl-C) before the launcher exited
+                if proc.returncode is None:
+                    kill_group()
     except Exception as e:
-        return f"ERROR: {e}", -1
+        return counts, f"ERROR: {e}", -1
+    if timed_out.is_set():
+        return counts, "TIMEOUT (30 min)", -1
+    # Only the kept lines are decoded; the output need not be valid UTF-8
+    return counts, b"".join(head).decode(errors="replace"), exit_code
 
 
 def compare_counts(og_counts: Dict[Tuple[int, int], int],
@@ -113,8 +188,13 @@ def compare_counts(og_counts: Dict[Tuple[int, int], int],
     
     Returns (success, message).
     """
-    og_keys = set(og_counts.keys())
-    ahp_keys = set(ahp_counts.keys())
+    # dict equality is a C-level scan; only build the diff when it fails
+    if og_counts == ahp_counts:
+        return True, f"All {len(og_counts)} components match"
+    
+    # Key views support set operations without copying the keys
+    og_keys = og_counts.keys()
+    ahp_keys = ahp_counts.keys()
     
     # Check for missing/extra components
     missing_in_ahp = og_keys - ahp_keys
@@ -127,14 +207,15 @@ def compare_counts(og_counts: Dict[Tuple[int, int], int],
         return False, f"Extra components in AHP: {sorted(extra_in_ahp)}"
     
     # Compare counts
-    mismatches = []
-    for key in og_keys:
-        if og_counts[key] != ahp_counts[key]:
-            mismatches.append((key, og_counts[key], ahp_counts[key]))
+    mismatches = [
+        (key, og_val, ahp_counts[key])
+        for key, og_val in og_counts.items()
+        if ahp_counts[key] != og_val
+    ]
     
     if mismatches:
         msg = "recvCount mismatches:\n"
-        for (row, col), og_val, ahp_val in sorted(mismatches)[:10]:
+        for (row, col), og_val, ahp_val in heapq.nsmallest(10, mismatches):
             msg += f"  ({row},{col}): og={og_val}, ahp={ahp_val}\n"
         if len(mismatches) > 10:
             msg += f"  ... and {len(mismatches) - 10} more\n"
@@ -172,6 +253,9 @@ class TestCase:
         self.num_ranks_per_node = num_ranks_per_node
         self.time_to_run = time_to_run
         self.total_ranks = num_nodes * num_ranks_per_node
+        self.valid, self.valid_msg = validate_config(
+            height, num_rings, self.total_ranks
+        )
     
     def __str__(self):
         return (
@@ -182,9 +266,91 @@ class TestCase:
         )
 
 
+def cached_run(run, script: str, height: int, width: int, num_rings: int,
+               total_ranks: int, time_to_run: str):
+    """Return run(), reusing the recvCounts of an earlier successful run.
+    
+    The cache key covers the script's mtime and every parameter that the
+    counts depend on, so editing the script invalidates its entries. The
+    node/rank split is not part of the key; only the total rank count is.
+    Rebuilding the phold element does not invalidate entries, which is why
+    the cache is opt-in.
+    """
+    try:
+        mtime = os.path.getmtime(script)
+    except OSError:
+        return run()
+    config = (script, mtime, height, width, num_rings, total_ranks, time_to_run)
+    key = hashlib.blake2b(repr(config).encode(), digest_size=16).hexdigest()
+    path = os.path.join(CACHE_DIR, f"{key}.json")
+    # Concurrent tests with the same config (e.g. 1N x 4R and 2N x 2R) wait
+    # for a single reference run and then read its entry
+    with _CACHE_LOCKS.setdefault(key, threading.Lock()):
+        try:
+            with open(path) as f:
+                return {(row, col): count for row, col, count in json.load(f)}, "", 0
+        except (OSError, ValueError):
+            pass
+        
+        counts, output, exit_code = run()
+        if exit_code == 0 and counts:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            # Write then rename so other processes never read a partial file
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}"
+            with open(tmp_path, "w") as f:
+                json.dump([[row, col, count] for (row, col), count in counts.items()], f)
+            os.replace(tmp_path, path)
+    return counts, output, exit_code
+
+
+def run_og_and_ahp(height: int, width: int, num_rings: int,
+                   num_nodes: int, num_ranks_per_node: int,
+                   time_to_run: str, architecture: str, launcher: str,
+                   serial: bool = False, use_cache: bool = False):
+    """Run phold_dist.py and phold_dist_ahp.py on one configuration.
+    
+    Returns the two run_simulation results as (og, ahp). The jobs are
+    independent, so they run concurrently unless serial is set. The original
+    is the reference, so with use_cache its counts come from CACHE_DIR when
+    an earlier run matches (off by default).
+    """
+    run_og = functools.partial(
+        run_simulation,
+        "phold_dist.py",
+        height, width, num_rings,
+        num_nodes, num_ranks_per_node,
+        time_to_run,
+        launcher=launcher,
+    )
+    run_ahp = functools.partial(
+        run_simulation,
+        "phold_dist_ahp.py",
+        height, width, num_rings,
+        num_nodes, num_ranks_per_node,
+        time_to_run,
+        extra_args=[f"--architecture={architecture}"],
+        launcher=launcher,
+    )
+    if use_cache:
+        run_og = functools.partial(
+            cached_run, run_og, "phold_dist.py",
+            height, width, num_rings,
+            num_nodes * num_ranks_per_node, time_to_run,
+        )
+    if serial:
+        return run_og(), run_ahp()
+    # Threads suffice: both spend their time waiting on the subprocess
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        fut_og = executor.submit(run_og)
+        fut_ahp = executor.submit(run_ahp)
+        return fut_og.result(), fut_ahp.result()
+
+
 def run_test(test: TestCase, verbose: bool = True,
              architecture: str = "spmd",
-             launcher: str = "auto") -> Tuple[bool, str]:
+             launcher: str = "auto",
+             serial: bool = False,
+             use_cache: bool = False) -> Tuple[bool, str]:
     """Run a single test case."""
     
     if verbose:
@@ -193,47 +359,32 @@ def run_test(test: TestCase, verbose: bool = True,
         print(f"{'='*60}")
     
     # Validate configuration
-    valid, msg = validate_config(test.height, test.num_rings, test.total_ranks)
-    if not valid:
-        return False, f"SKIP: {msg}"
+    if not test.valid:
+        return False, f"SKIP: {test.valid_msg}"
     
-    # Run original implementation
+    # Run original and AHP implementations
     if verbose:
-        print("Running phold_dist.py...")
-    og_output, og_exit = run_simulation(
-        "phold_dist.py",
+        print("Running phold_dist.py and phold_dist_ahp.py...")
+    og_result, ahp_result = run_og_and_ahp(
         test.height, test.width, test.num_rings,
         test.num_nodes, test.num_ranks_per_node,
-        test.time_to_run,
-        launcher=launcher,
+        test.time_to_run, architecture, launcher, serial, use_cache,
     )
+    og_counts, og_output, og_exit = og_result
+    ahp_counts, ahp_output, ahp_exit = ahp_result
     
     if og_exit != 0:
         return False, f"Original failed with exit code {og_exit}:\n{og_output[:500]}"
     
-    og_counts = parse_recv_counts(og_output)
     if not og_counts:
         return False, f"No recvCounts parsed from original output:\n{og_output[:500]}"
     
     if verbose:
         print(f"  Parsed {len(og_counts)} components from original")
     
-    # Run AHP implementation
-    if verbose:
-        print("Running phold_dist_ahp.py...")
-    ahp_output, ahp_exit = run_simulation(
-        "phold_dist_ahp.py",
-        test.height, test.width, test.num_rings,
-        test.num_nodes, test.num_ranks_per_node,
-        test.time_to_run,
-        extra_args=[f"--architecture={architecture}"],
-        launcher=launcher,
-    )
-    
     if ahp_exit != 0:
         return False, f"AHP failed with exit code {ahp_exit}:\n{ahp_output[:500]}"
     
-    ahp_counts = parse_recv_counts(ahp_output)
     if not ahp_counts:
         return False, f"No recvCounts parsed from AHP output:\n{ahp_output[:500]}"
     
@@ -251,19 +402,23 @@ def print_counts_grid(counts: Dict[Tuple[int, int], int], height: int, width: in
     print(f"\n{label} recvCounts ({height}x{width} grid):")
     print("-" * (width * 6 + 5))
     
-    for row in range(height):
-        row_vals = []
-        for col in range(width):
-            val = counts.get((row, col), -1)
-            row_vals.append(f"{val:5d}")
-        print(f"R{row:02d}: {' '.join(row_vals)}")
+    # Fill from the dict once rather than looking up every cell
+    grid = [[-1] * width for _ in range(height)]
+    for (row, col), val in counts.items():
+        if row < height and col < width:
+            grid[row][col] = val
+    
+    for row, vals in enumerate(grid):
+        print(f"R{row:02d}: {' '.join(f'{val:5d}' for val in vals)}")
     print()
 
 
 def run_inspect_single(height: int, width: int, num_rings: int,
                        num_nodes: int, num_ranks: int, label: str,
                        architecture: str = "spmd",
-                       launcher: str = "auto") -> int:
+                       launcher: str = "auto",
+                       serial: bool = False,
+                       use_cache: bool = False) -> int:
     """Run inspection for a single configuration and return 0 if match, 1 if diff."""
     total_ranks = num_nodes * num_ranks
     
@@ -280,30 +435,22 @@ def run_inspect_single(height: int, width: int, num_rings: int,
         print(f"Invalid config: {msg}")
         return 1
     
-    # Run original
-    print("\nRunning phold_dist.py...")
-    og_output, og_exit = run_simulation(
-        "phold_dist.py", height, width, num_rings,
-        num_nodes, num_ranks, "1000ns", launcher=launcher
+    # Run original and AHP
+    print("\nRunning phold_dist.py and phold_dist_ahp.py...")
+    og_result, ahp_result = run_og_and_ahp(
+        height, width, num_rings, num_nodes, num_ranks, "1000ns",
+        architecture, launcher, serial, use_cache,
     )
+    og_counts, og_output, og_exit = og_result
+    ahp_counts, ahp_output, ahp_exit = ahp_result
     if og_exit != 0:
         print(f"Original failed: {og_output[:500]}")
         return 1
-    og_counts = parse_recv_counts(og_output)
     print(f"  Parsed {len(og_counts)} components")
     
-    # Run AHP
-    print("Running phold_dist_ahp.py...")
-    ahp_output, ahp_exit = run_simulation(
-        "phold_dist_ahp.py", height, width, num_rings,
-        num_nodes, num_ranks, "1000ns",
-        extra_args=[f"--architecture={architecture}"],
-        launcher=launcher
-    )
     if ahp_exit != 0:
         print(f"AHP failed: {ahp_output[:500]}")
         return 1
-    ahp_counts = parse_recv_counts(ahp_output)
     print(f"  Parsed {len(ahp_counts)} components")
     
     # Print grids side by side (or sequentially for readability)
@@ -333,9 +480,11 @@ def run_inspect_single(height: int, width: int, num_rings: int,
     return 0 if not diffs else 1
 
 
-def run_inspect_mode(tests: List['TestCase'], test_name: Optional[str],
+def run_inspect_mode(tests: Sequence['TestCase'], test_name: Optional[str],
                      architecture: str = "spmd",
-                     launcher: str = "auto") -> int:
+                     launcher: str = "auto",
+                     serial: bool = False,
+                     use_cache: bool = False) -> int:
     """Run inspect mode - print detailed recvCount values for comparison.
     
     If no test specified, runs both base configurations (8x8 grid).
@@ -355,6 +504,8 @@ def run_inspect_mode(tests: List['TestCase'], test_name: Optional[str],
             test.num_nodes, test.num_ranks_per_node, test.name,
             architecture=architecture,
             launcher=launcher,
+            serial=serial,
+            use_cache=use_cache,
         )
     
     # Default: run both base configurations
@@ -366,6 +517,8 @@ def run_inspect_mode(tests: List['TestCase'], test_name: Optional[str],
         label="base_8x8_1n_2r (1 node, 2 ranks)",
         architecture=architecture,
         launcher=launcher,
+        serial=serial,
+        use_cache=use_cache,
     )
     
     result2 = run_inspect_single(
@@ -374,6 +527,8 @@ def run_inspect_mode(tests: List['TestCase'], test_name: Optional[str],
         label="base_8x8_2n_2r (2 nodes, 2 ranks each)",
         architecture=architecture,
         launcher=launcher,
+        serial=serial,
+        use_cache=use_cache,
     )
     
     # Summary
@@ -386,7 +541,8 @@ def run_inspect_mode(tests: List['TestCase'], test_name: Optional[str],
     return 0 if (result1 == 0 and result2 == 0) else 1
 
 
-def get_test_cases() -> List[TestCase]:
+@functools.cache
+def get_test_cases() -> Tuple[TestCase, ...]:
     """Define test cases.
     
     Each test ensures enough rows per rank for the given numRings.
@@ -522,7 +678,7 @@ def get_test_cases() -> List[TestCase]:
         time_to_run="1000ns"
     ))
     
-    return tests
+    return tuple(tests)
 
 
 def main():
@@ -558,6 +714,22 @@ def main():
         "--launcher", choices=["auto", "mpirun", "srun"], default="auto",
         help="Select the job launcher at runtime"
     )
+    parser.add_argument(
+        "--serial", action="store_true",
+        help="Run the original and AHP simulations one after the other (for debugging)"
+    )
+    parser.add_argument(
+        "--jobs", type=int, default=1,
+        help="Number of test cases to run at once (default: 1)"
+    )
+    parser.add_argument(
+        "--cache", action="store_true",
+        help=(
+            f"Reuse phold_dist.py recvCounts cached in {CACHE_DIR}/ and run "
+            f"each reference config once. The key does not track rebuilds of "
+            f"the phold element, so only use this while the element is unchanged"
+        )
+    )
     args = parser.parse_args()
     
     tests = get_test_cases()
@@ -565,8 +737,7 @@ def main():
     if args.list:
         print("Available tests:")
         for t in tests:
-            valid, _ = validate_config(t.height, t.num_rings, t.total_ranks)
-            status = "✓" if valid else "✗"
+            status = "✓" if t.valid else "✗"
             print(f"  {status} {t}")
         return 0
     
@@ -583,6 +754,8 @@ def main():
                 args.test,
                 architecture=arch,
                 launcher=args.launcher,
+                serial=args.serial,
+                use_cache=args.cache,
             )
             if rc != 0:
                 inspect_rc = 1
@@ -594,41 +767,63 @@ def main():
             print(f"Test '{args.test}' not found")
             return 1
     
-    passed = 0
-    failed = 0
-    skipped = 0
-    results = []
-
     architectures = (
         SUPPORTED_ARCHITECTURES if args.architecture == "all"
         else [args.architecture]
     )
-
-    for arch in architectures:
-        if not args.quiet:
-            print(f"\nTesting architecture='{arch}'")
-        for test in tests:
+    jobs = [(arch, test) for arch in architectures for test in tests]
+    totals = Counter()
+    results = [None] * len(jobs)
+
+    def record(index: int, success: bool, msg: str) -> str:
+        arch, test = jobs[index]
+        if "SKIP" in msg:
+            status = "SKIP"
+        elif success:
+            status = "PASS"
+        else:
+            status = "FAIL"
+        totals[status] += 1
+        results[index] = (f"{test.name} [{arch}]", status, msg)
+        return status
+
+    if args.jobs == 1:
+        for index, (arch, test) in enumerate(jobs):
+            if not args.quiet and test is tests[0]:
+                print(f"\nTesting architecture='{arch}'")
             success, msg = run_test(
                 test,
                 verbose=not args.quiet,
                 architecture=arch,
                 launcher=args.launcher,
+                serial=args.serial,
+                use_cache=args.cache,
             )
-
-            if "SKIP" in msg:
-                skipped += 1
-                status = "SKIP"
-            elif success:
-                passed += 1
-                status = "PASS"
-            else:
-                failed += 1
-                status = "FAIL"
-
-            results.append((f"{test.name} [{arch}]", status, msg))
-
+            status = record(index, success, msg)
             if not args.quiet:
                 print(f"\n{status}: {msg}")
+    else:
+        # Each test only waits on its own srun jobs, so threads suffice.
+        # Per-test progress would interleave, so only results are printed.
+        with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+            futures = {
+                executor.submit(
+                    run_test,
+                    test,
+                    verbose=False,
+                    architecture=arch,
+                    launcher=args.launcher,
+                    serial=args.serial,
+                    use_cache=args.cache,
+                ): index
+                for index, (arch, test) in enumerate(jobs)
+            }
+            for future in as_completed(futures):
+                index = futures[future]
+                success, msg = future.result()
+                status = record(index, success, msg)
+                if not args.quiet:
+                    print(f"\n{status}: {results[index][0]}: {msg}")
     
     # Summary
     print(f"\n{'='*60}")
@@ -639,9 +834,12 @@ def main():
         symbol = {"PASS": "✓", "FAIL": "✗", "SKIP": "○"}[status]
         print(f"  {symbol} {name}: {status}")
     
-    print(f"\nTotal: {passed} passed, {failed} failed, {skipped} skipped")
+    print(
+        f"\nTotal: {totals['PASS']} passed, {totals['FAIL']} failed, "
+        f"{totals['SKIP']} skipped"
+    )
     
-    return 0 if failed == 0 else 1
+    return 0 if totals["FAIL"] == 0 else 1
 
 
 if __name__ == "__main__":